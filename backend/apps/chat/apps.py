@@ -11,8 +11,10 @@ class ChatConfig(AppConfig):
 
     def ready(self):
         """
-        Import signals when app is ready.
+        Import signals and system checks when app is ready.
         """
+        from . import checks  # noqa: F401
+        
         try:
             import apps.chat.signals  # noqa: F401
         except ImportError:
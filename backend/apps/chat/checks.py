@@ -0,0 +1,30 @@
+"""
+System checks for chat application.
+"""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends whose entries live in one process only
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Warn when the default cache isn't shared between processes.
+    
+    Cached room rows, access grants and room-list stamps are invalidated by
+    deleting cache keys; on a process-local cache the delete only reaches
+    the worker that made the change, and the others keep serving stale data.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHE_BACKENDS:
+        return [Warning(
+            f"The default cache ({backend}) is local to each process.",
+            hint="Point CACHES['default'] at a shared backend such as Redis.",
+            id='chat.W001',
+        )]
+    return []
@@ -1,14 +1,18 @@
 """
 WebSocket consumers for real-time chat.
 """
+import asyncio
 import json
 import logging
+import time
+import weakref
 from typing import Optional, Dict, Any
 from uuid import UUID
 
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
+from django.db.models import Q
 
 from .models import ChatRoom, ChatMessage, ChatRoomMembership
 from .services import ChatRoomService, ChatMessageService, ChatPermissionService
@@ -16,18 +20,197 @@ from .services import ChatRoomService, ChatMessageService, ChatPermissionService
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Prefer orjson's C parser/encoder for frames; fall back to stdlib json.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers only
+# need to catch the latter.
+try:
+    import orjson
+    _loads = orjson.loads
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    _loads = json.loads
+    _dumps = json.dumps
+
+# Frames larger than this are rejected before parsing.
+MAX_MESSAGE_SIZE = 64 * 1024
+
+# Minimum interval between repeated typing events with the same state.
+TYPING_THROTTLE_SECONDS = 0.5
+
+# Fixed-shape frames for high-frequency events are rendered from templates
+# instead of building a dict and running it through the JSON encoder.
+# Only string fields need escaping, which _dumps does on the scalar.
+_TYPING_FRAME = '{{"type":"typing","user_id":{user_id},"username":{username},"is_typing":{is_typing}}}'
+_READ_RECEIPT_FRAME = '{{"type":"read_receipt","user_id":{user_id},"username":{username},"message_id":{message_id}}}'
+_PRESENCE_FRAME = '{{"type":"{type}","user_id":{user_id},"username":{username}}}'
+
+
+def _typing_frame(event: Dict[str, Any]) -> str:
+    """Render a typing indicator frame."""
+    return _TYPING_FRAME.format(
+        user_id=int(event['user_id']),
+        username=_dumps(event['username']),
+        is_typing='true' if event['is_typing'] else 'false',
+    )
+
+
+def _read_receipt_frame(event: Dict[str, Any]) -> str:
+    """Render a read receipt frame."""
+    return _READ_RECEIPT_FRAME.format(
+        user_id=int(event['user_id']),
+        username=_dumps(event['username']),
+        message_id=_dumps(event.get('message_id')),
+    )
+
+
+def _presence_frame(frame_type: str, event: Dict[str, Any]) -> str:
+    """Render a user joined/left/online/offline frame."""
+    return _PRESENCE_FRAME.format(
+        type=frame_type,
+        user_id=int(event['user_id']),
+        username=_dumps(event['username']),
+    )
+
+
+class MessageOutbox:
+    """
+    Per-worker queue that batches chat message inserts.
+
+    Consumers enqueue unsaved messages and return immediately. A single
+    background task drains up to BATCH_SIZE messages at a time, saves them
+    with one bulk insert and then broadcasts them in queue order.
+
+    Entries hold consumers weakly: a consumer that disconnects before its
+    message is flushed is not kept alive, and its message is still saved
+    and broadcast to the room.
+    """
+
+    MAX_SIZE = 1000
+    BATCH_SIZE = 64
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+
+    @staticmethod
+    def entry(consumer: 'ChatConsumer', message: ChatMessage):
+        """Build a queue entry: (consumer ref, channel layer, room group, message)."""
+        return (weakref.ref(consumer), consumer.channel_layer, consumer.room_group_name, message)
+
+    async def put(self, consumer: 'ChatConsumer', message: ChatMessage):
+        """Queue a message for saving, starting the writer if needed."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self.queue = asyncio.Queue(maxsize=self.MAX_SIZE)
+            self._loop = loop
+            self._task = loop.create_task(self._writer_loop())
+        
+        await self.queue.put(self.entry(consumer, message))
+
+    async def _writer_loop(self):
+        """Drain the queue in batches until cancelled."""
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            
+            try:
+                await self._flush(batch)
+            except Exception:
+                logger.exception(f"Chat outbox flush failed for {len(batch)} messages")
+
+    async def _flush(self, batch):
+        """Save a batch and broadcast each saved message."""
+        messages = [message for *_, message in batch]
+        try:
+            await database_sync_to_async(ChatMessageService.bulk_create_messages)(messages)
+            saved = messages
+        except Exception as e:
+            # One bad row (e.g. a dangling reply_to) must not drop the whole
+            # batch, so retry the messages individually.
+            logger.warning(f"Bulk message insert failed, retrying individually: {str(e)}")
+            saved = await database_sync_to_async(self._save_individually)(messages)
+        
+        # Every send is guarded on its own: the batch is already committed,
+        # so one failure must not keep the rest from being broadcast
+        for (consumer_ref, channel_layer, group_name, _), message in zip(batch, saved):
+            if message is None:
+                consumer = consumer_ref()
+                if consumer is None or consumer.closed:
+                    continue  # Nobody left to tell
+                try:
+                    await consumer.send_error("Failed to save message")
+                except Exception as e:
+                    logger.warning(f"Failed to report unsaved message: {str(e)}")
+                continue
+            
+            try:
+                await channel_layer.group_send(
+                    group_name,
+                    {
+                        'type': 'chat_message_broadcast',
+                        # Encoded once here instead of once per subscriber
+                        'frame': _dumps({
+                            'type': 'chat_message',
+                            'message': message.to_websocket_dict(),
+                        }),
+                    }
+                )
+            except Exception as e:
+                logger.warning(f"Failed to broadcast message {message.id}: {str(e)}")
+
+    @staticmethod
+    def _save_individually(messages):
+        """Save messages one by one, returning None for failures."""
+        saved = []
+        for message in messages:
+            try:
+                saved.append(ChatMessageService.create_message(
+                    room=message.room,
+                    sender=message.sender,
+                    content=message.content,
+                    message_type=message.message_type,
+                    reply_to_id=message.reply_to_id
+                ))
+            except Exception as e:
+                logger.error(f"Failed to save message: {str(e)}")
+                saved.append(None)
+        return saved
+
+
+outbox = MessageOutbox()
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
     """
     Main WebSocket consumer for chat functionality.
     """
 
+    # Inbound message type -> handler method name
+    HANDLERS = {
+        'chat_message': 'handle_chat_message',
+        'typing': 'handle_typing',
+        'read': 'handle_read',
+        'delete': 'handle_delete',
+    }
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.room_id: Optional[str] = None
         self.room_group_name: Optional[str] = None
         self.room: Optional[ChatRoom] = None
         self.user = None
+        self._last_typing_sent = 0.0
+        self._last_typing_state: Optional[bool] = None
+        self._last_read_message_id = None
+        self._participant_ids: frozenset = frozenset()
+        self.closed = False
 
     async def connect(self):
         """Handle WebSocket connection."""
@@ -48,8 +231,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close(code=4002)
             return
         
-        # Get room and check access
-        self.room = await self.get_room()
+        # Get room, check access and preload participants (so inbound
+        # messages are authorized in memory) in one thread-pool hop
+        self.room, has_access, self._participant_ids = await self.load_room_state()
         
         if not self.room:
             logger.warning(f"WebSocket connection rejected: Room not found - {self.room_id}")
@@ -57,14 +241,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return
         
         # Check room access permission
-        has_access = await self.check_access()
         if not has_access:
             logger.warning(f"WebSocket connection rejected: Access denied for user {self.user.id}")
             await self.close(code=4004)
             return
         
         # Set channel group name
-        self.room_group_name = f"chat_{self.room_id}"
+        self.room_group_name = self.room.channel_group_name
         
         # Join room group
         await self.channel_layer.group_add(
@@ -82,13 +265,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             {
                 'type': 'user_joined',
+                'sender_channel': self.channel_name,
                 'user_id': self.user.id,
                 'username': self.user.username,
             }
         )
         
         # Send connection confirmation to client
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=_dumps({
             'type': 'connection_established',
             'room_id': str(self.room.id),
             'room_name': self.room.name,
@@ -97,6 +281,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
+        self.closed = True  # The outbox stops sending errors to this socket
+        
         if self.room_group_name:
             # Broadcast user left event
             if self.user and self.user.is_authenticated:
@@ -104,6 +290,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     self.room_group_name,
                     {
                         'type': 'user_left',
+                        'sender_channel': self.channel_name,
                         'user_id': self.user.id,
                         'username': self.user.username,
                     }
@@ -119,20 +306,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data):
         """Handle incoming WebSocket messages."""
+        if text_data and len(text_data) > MAX_MESSAGE_SIZE:
+            await self.send_error("Message too large")
+            return
+
         try:
-            data = json.loads(text_data)
+            data = _loads(text_data)
             message_type = data.get('type', 'chat_message')
             
-            handlers = {
-                'chat_message': self.handle_chat_message,
-                'typing': self.handle_typing,
-                'read': self.handle_read,
-                'delete': self.handle_delete,
-            }
-            
-            handler = handlers.get(message_type)
-            if handler:
-                await handler(data)
+            handler_name = self.HANDLERS.get(message_type)
+            if handler_name and not self.is_allowed():
+                await self.send_error("You are no longer a participant in this room")
+            elif handler_name:
+                await getattr(self, handler_name)(data)
             else:
                 await self.send_error(f"Unknown message type: {message_type}")
                 
@@ -152,34 +338,39 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.send_error("Message content is required")
             return
         
-        # Save message to database
-        message = await self.save_message(
-            content=content,
-            message_type=message_type,
-            reply_to_id=reply_to_id
-        )
-        
-        if not message:
+        try:
+            reply_to_uuid = UUID(reply_to_id) if reply_to_id else None
+        except (TypeError, ValueError):
             await self.send_error("Failed to save message")
             return
         
-        # Broadcast message to room
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'chat_message_broadcast',
-                'message': message.to_websocket_dict(),
-            }
-        )
+        # Queue the message; the outbox saves and broadcasts it in order
+        await outbox.put(self, ChatMessage(
+            room=self.room,
+            sender=self.user,
+            content=content,
+            message_type=message_type,
+            reply_to_id=reply_to_uuid,
+        ))
 
     async def handle_typing(self, data: Dict[str, Any]):
         """Handle typing indicator."""
-        is_typing = data.get('is_typing', True)
+        is_typing = bool(data.get('is_typing', True))
+        
+        # Drop repeats of the same state inside the throttle window
+        now = time.monotonic()
+        if (is_typing == self._last_typing_state
+                and now - self._last_typing_sent < TYPING_THROTTLE_SECONDS):
+            return
+        
+        self._last_typing_state = is_typing
+        self._last_typing_sent = now
         
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'typing_broadcast',
+                'sender_channel': self.channel_name,
                 'user_id': self.user.id,
                 'username': self.user.username,
                 'is_typing': is_typing,
@@ -189,12 +380,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def handle_read(self, data: Dict[str, Any]):
         """Handle read receipt."""
         message_id = data.get('message_id')
+        
+        # Nothing new to acknowledge if this message was already reported read
+        if message_id and message_id == self._last_read_message_id:
+            return
+        
+        self._last_read_message_id = message_id
         count = await self.mark_messages_read()
         
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'read_receipt_broadcast',
+                'sender_channel': self.channel_name,
                 'user_id': self.user.id,
                 'username': self.user.username,
                 'message_id': message_id,
@@ -227,33 +425,22 @@ class ChatConsumer(AsyncWebsocketConsumer):
     # Group message handlers
     async def chat_message_broadcast(self, event):
         """Send chat message to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'message': event['message'],
-        }))
+        await self.send(text_data=event['frame'])
 
     async def typing_broadcast(self, event):
         """Send typing indicator to WebSocket."""
         if event['user_id'] != self.user.id:
-            await self.send(text_data=json.dumps({
-                'type': 'typing',
-                'user_id': event['user_id'],
-                'username': event['username'],
-                'is_typing': event['is_typing'],
-            }))
+            await self.send(text_data=_typing_frame(event))
 
     async def read_receipt_broadcast(self, event):
         """Send read receipt to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'read_receipt',
-            'user_id': event['user_id'],
-            'username': event['username'],
-            'message_id': event.get('message_id'),
-        }))
+        if event.get('sender_channel') == self.channel_name:
+            return
+        await self.send(text_data=_read_receipt_frame(event))
 
     async def message_deleted_broadcast(self, event):
         """Send message deletion notification."""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=_dumps({
             'type': 'message_deleted',
             'message_id': event['message_id'],
             'deleted_by': event['deleted_by'],
@@ -262,59 +449,71 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def user_joined(self, event):
         """Send user joined notification."""
         if event['user_id'] != self.user.id:
-            await self.send(text_data=json.dumps({
-                'type': 'user_joined',
-                'user_id': event['user_id'],
-                'username': event['username'],
-            }))
+            await self.send(text_data=_presence_frame('user_joined', event))
 
     async def user_left(self, event):
         """Send user left notification."""
-        await self.send(text_data=json.dumps({
-            'type': 'user_left',
-            'user_id': event['user_id'],
-            'username': event['username'],
-        }))
+        if event.get('sender_channel') == self.channel_name:
+            return
+        await self.send(text_data=_presence_frame('user_left', event))
+
+    async def participants_changed(self, event):
+        """Reload cached participant IDs after a membership change."""
+        self._participant_ids = await self.load_participant_ids()
 
     async def send_error(self, message: str):
         """Send error message to client."""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=_dumps({
             'type': 'error',
             'message': message,
         }))
 
     # Database operations
     @database_sync_to_async
-    def get_room(self):
-        """Get room by ID from database."""
+    def load_room_state(self):
+        """
+        Load the room, check access and fetch participant IDs together.
+        
+        Returns:
+            Tuple of (room or None, has_access, participant_ids)
+        """
         try:
-            return ChatRoom.objects.select_related('project').get(
+            room = ChatRoom.objects.select_related('project').get(
                 id=self.room_id,
                 is_active=True
             )
         except ChatRoom.DoesNotExist:
-            return None
+            return None, False, frozenset()
+        
+        participant_ids = self._fetch_participant_ids(room)
+        
+        # Same rules as ChatRoomService.check_room_access, answered from the
+        # participant set instead of a separate membership query or cache read
+        has_access = (
+            room.room_type == ChatRoom.RoomType.GLOBAL
+            or getattr(self.user, 'role', None) == 'admin'
+            or self.user.id in participant_ids
+        )
+        
+        return room, has_access, participant_ids
 
-    @database_sync_to_async
-    def check_access(self) -> bool:
-        """Check if user has access to room."""
-        return ChatRoomService.check_room_access(self.room, self.user)
+    def is_allowed(self) -> bool:
+        """Check the connected user may still act in the room, without a query."""
+        if getattr(self.user, 'role', None) == 'admin':
+            return True
+        return self.room.is_participant(self.user, cached_ids=self._participant_ids)
 
     @database_sync_to_async
-    def save_message(self, content: str, message_type: str = 'text', reply_to_id: Optional[str] = None):
-        """Save message to database."""
-        try:
-            reply_to_uuid = UUID(reply_to_id) if reply_to_id else None
-            return ChatMessageService.create_message(
-                room=self.room,
-                sender=self.user,
-                content=content,
-                message_type=message_type,
-                reply_to_id=reply_to_uuid
-            )
-        except Exception as e:
-            logger.error(f"Failed to save message: {str(e)}")
-            return None
+    def load_participant_ids(self) -> frozenset:
+        """Reload participant IDs for the connected room."""
+        return self._fetch_participant_ids(self.room)
+
+    @staticmethod
+    def _fetch_participant_ids(room: ChatRoom) -> frozenset:
+        """Participant IDs for a room (empty for global rooms)."""
+        if room.room_type == ChatRoom.RoomType.GLOBAL:
+            return frozenset()
+        return frozenset(room.memberships.values_list('user_id', flat=True))
 
     @database_sync_to_async
     def mark_messages_read(self) -> int:
@@ -324,11 +523,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def delete_message(self, message_id: str) -> bool:
         """Delete a message."""
-        try:
-            message = ChatMessage.objects.get(id=message_id, room=self.room)
-            return ChatMessageService.delete_message(message, self.user)
-        except ChatMessage.DoesNotExist:
-            return False
+        return ChatMessageService.delete_message_by_id(self.room, message_id, self.user)
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -367,7 +562,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         pass
 
     async def new_message_notification(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=_dumps({
             'type': 'new_message',
             'room_id': event['room_id'],
             'room_name': event['room_name'],
@@ -425,18 +620,10 @@ class OnlineStatusConsumer(AsyncWebsocketConsumer):
 
     async def user_online(self, event):
         if event['user_id'] != self.user.id:
-            await self.send(text_data=json.dumps({
-                'type': 'user_online',
-                'user_id': event['user_id'],
-                'username': event['username'],
-            }))
+            await self.send(text_data=_presence_frame('user_online', event))
 
     async def user_offline(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'user_offline',
-            'user_id': event['user_id'],
-            'username': event['username'],
-        }))
+        await self.send(text_data=_presence_frame('user_offline', event))
 
 class GlobalChatConsumer(AsyncWebsocketConsumer):
     """
@@ -482,7 +669,7 @@ class GlobalChatConsumer(AsyncWebsocketConsumer):
         logger.info(f"User {self.user.username} connected to global chat ({len(self.room_groups)} rooms)")
         
         # Send connection confirmation
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=_dumps({
             'type': 'connection_established',
             'message': 'Connected to global chat',
             'rooms_count': len(self.room_groups),
@@ -508,17 +695,20 @@ class GlobalChatConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data):
         """Handle incoming messages - global doesn't accept messages, only receives."""
+        if text_data and len(text_data) > MAX_MESSAGE_SIZE:
+            return
+
         try:
-            data = json.loads(text_data)
+            data = _loads(text_data)
             message_type = data.get('type')
             
             if message_type == 'ping':
-                await self.send(text_data=json.dumps({'type': 'pong'}))
+                await self.send(text_data=_dumps({'type': 'pong'}))
             elif message_type == 'refresh_rooms':
                 # Refresh room subscriptions
                 await self.refresh_room_subscriptions()
             else:
-                await self.send(text_data=json.dumps({
+                await self.send(text_data=_dumps({
                     'type': 'error',
                     'message': 'Global connection is read-only. Connect to specific room to send messages.'
                 }))
@@ -544,7 +734,7 @@ class GlobalChatConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
         
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=_dumps({
             'type': 'rooms_refreshed',
             'rooms_count': len(self.room_groups),
         }))
@@ -552,49 +742,38 @@ class GlobalChatConsumer(AsyncWebsocketConsumer):
     # Message handlers - receive broadcasts from rooms
     async def chat_message_broadcast(self, event):
         """Receive chat message from any room."""
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'message': event['message'],
-        }))
+        await self.send(text_data=event['frame'])
 
     async def typing_broadcast(self, event):
         """Receive typing indicator."""
         if event['user_id'] != self.user.id:
-            await self.send(text_data=json.dumps({
-                'type': 'typing',
-                'user_id': event['user_id'],
-                'username': event['username'],
-                'is_typing': event['is_typing'],
-            }))
+            await self.send(text_data=_typing_frame(event))
 
     async def user_joined(self, event):
         """Receive user joined notification."""
         if event['user_id'] != self.user.id:
-            await self.send(text_data=json.dumps({
-                'type': 'user_joined',
-                'user_id': event['user_id'],
-                'username': event['username'],
-            }))
+            await self.send(text_data=_presence_frame('user_joined', event))
 
     async def user_left(self, event):
         """Receive user left notification."""
-        await self.send(text_data=json.dumps({
-            'type': 'user_left',
-            'user_id': event['user_id'],
-            'username': event['username'],
-        }))
+        await self.send(text_data=_presence_frame('user_left', event))
 
     async def message_deleted_broadcast(self, event):
         """Receive message deletion notification."""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=_dumps({
             'type': 'message_deleted',
             'message_id': event['message_id'],
             'deleted_by': event['deleted_by'],
         }))
 
+    async def participants_changed(self, event):
+        """Resubscribe when this user's own room membership changed."""
+        if event['user_id'] == self.user.id:
+            await self.refresh_room_subscriptions()
+
     async def new_room_notification(self, event):
         """Receive notification when added to a new room."""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=_dumps({
             'type': 'new_room',
             'room_id': event['room_id'],
             'room_name': event['room_name'],
@@ -609,18 +788,11 @@ class GlobalChatConsumer(AsyncWebsocketConsumer):
         """Get all channel group names for rooms user belongs to."""
         from .models import ChatRoom, ChatRoomMembership
         
-        # Get rooms user is a member of
-        room_ids = ChatRoomMembership.objects.filter(
-            user=self.user
-        ).values_list('room_id', flat=True)
-        
-        # Get global rooms (everyone can access)
-        global_rooms = ChatRoom.objects.filter(
-            room_type=ChatRoom.RoomType.GLOBAL,
+        # Global rooms plus rooms the user is a member of, deduplicated in one query
+        room_ids = ChatRoom.objects.filter(
+            Q(room_type=ChatRoom.RoomType.GLOBAL) |
+            Q(id__in=ChatRoomMembership.objects.filter(user=self.user).values('room_id')),
             is_active=True
         ).values_list('id', flat=True)
         
-        # Combine and create group names
-        all_room_ids = set(room_ids) | set(global_rooms)
-        
-        return [f"chat_{room_id}" for room_id in all_room_ids]
\ No newline at end of file
+        return [ChatRoom.group_name_for(room_id) for room_id in room_ids]
@@ -0,0 +1,28 @@
+"""
+Management command to recompute denormalized chat room metadata.
+
+Usage:
+    python manage.py rebuild_chat_counters
+    python manage.py rebuild_chat_counters --room <room_id> --room <room_id>
+"""
+from django.core.management.base import BaseCommand
+
+from apps.chat.services import ChatRoomService
+
+
+class Command(BaseCommand):
+    help = 'Recompute last-message fields and unread counters for chat rooms'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--room',
+            action='append',
+            dest='room_ids',
+            default=None,
+            help='Limit the rebuild to this room ID (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        updated = ChatRoomService.rebuild_room_metadata(options['room_ids'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt metadata for {updated} chat rooms'))
@@ -6,20 +6,202 @@ Token can be passed via:
 1. Query string: ws://host/ws/chat/?token=<jwt_token>
 2. Subprotocol header (for browsers that support it)
 """
+import hashlib
 import logging
-from urllib.parse import parse_qs
+import time
+from typing import Dict, Optional
+from urllib.parse import unquote_plus
+
+import jwt
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
 from channels.auth import AuthMiddlewareStack
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Columns loaded for WebSocket users; covers everything consumers and access
+# checks read, so cached instances never lazy-load deferred fields.
+WS_USER_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'full_name',
+    'is_active', 'is_staff', 'is_superuser', 'role',
+)
+WS_USER_CACHE_TTL = 60
+
+# Token errors that mean "not authenticated"; anything else is a real bug
+TOKEN_ERRORS = (InvalidToken, TokenError)
+
+# SimpleJWT verification parameters, resolved once so handshakes decode with
+# PyJWT directly. Keys fetched from a JWKS endpoint still go through AccessToken.
+LOCAL_JWT_VERIFY = not jwt_settings.JWK_URL
+JWT_VERIFYING_KEY = (
+    jwt_settings.SIGNING_KEY if jwt_settings.ALGORITHM.startswith('HS')
+    else jwt_settings.VERIFYING_KEY
+)
+JWT_DECODE_OPTIONS = {
+    'algorithms': [jwt_settings.ALGORITHM],
+    'audience': jwt_settings.AUDIENCE,
+    'issuer': jwt_settings.ISSUER,
+    'leeway': jwt_settings.LEEWAY,
+    'options': {
+        'verify_aud': jwt_settings.AUDIENCE is not None,
+        'require': [claim for claim in ('exp', jwt_settings.JTI_CLAIM) if claim],
+    },
+}
+
+# Per-process memo of verified access tokens: token digest -> payload.
+# Clients on flaky networks reconnect with the same token, so repeat
+# handshakes skip signature verification. Entries are served only until the
+# token's exp; anything past that goes through the full decode again.
+_verified_tokens: Dict[bytes, dict] = {}
+VERIFIED_TOKEN_CACHE_MAX_SIZE = 4096
+
+
+def query_param(query_string: bytes, name: bytes) -> Optional[str]:
+    """
+    Return the first non-blank value of ``name`` in a raw query string.
+    
+    Scans for the key in place instead of building the full parse_qs dict;
+    only the matched value is decoded. Matches parse_qs semantics for the
+    first value (blank values are skipped, '+' and %XX are unescaped).
+    """
+    key = name + b'='
+    start = 0
+    while True:
+        index = query_string.find(key, start)
+        if index == -1:
+            return None
+        
+        value_start = index + len(key)
+        # Only match at a parameter boundary, so 'token' doesn't match 'api_token'
+        if index == 0 or query_string[index - 1] == 0x26:  # b'&'
+            value_end = query_string.find(b'&', value_start)
+            if value_end == -1:
+                value_end = len(query_string)
+            if value_end > value_start:
+                return unquote_plus(query_string[value_start:value_end].decode('utf-8'))
+        
+        start = value_start
+
+
+def bearer_token(headers) -> Optional[str]:
+    """
+    Return the token from an ``Authorization: Bearer`` header in raw ASGI headers.
+    
+    Compares the byte strings in place instead of building a header dict and
+    decoding every value.
+    """
+    for name, value in headers:
+        if name == b'authorization' and value.startswith(b'Bearer '):
+            return value[7:].decode('latin-1')
+    return None
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """
+    Verify a JWT access token and return its payload.
+    
+    Performs the same checks as SimpleJWT's AccessToken (signature, expiry,
+    audience, issuer, jti and token type) with a single PyJWT call instead of
+    the full token class pipeline.
+    
+    Verified payloads are memoized per process until they expire; the
+    returned dict may be shared, so don't mutate it.
+    
+    Returns:
+        The token payload, or None if the token is not a valid access token
+    """
+    digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    payload = _verified_tokens.get(digest)
+    if payload is not None:
+        if payload['exp'] > time.time():
+            return payload
+        _verified_tokens.pop(digest, None)
+    
+    if not LOCAL_JWT_VERIFY:
+        try:
+            payload = AccessToken(token).payload
+        except TOKEN_ERRORS:
+            return None
+    else:
+        try:
+            payload = jwt.decode(token, JWT_VERIFYING_KEY, **JWT_DECODE_OPTIONS)
+        except jwt.InvalidTokenError:
+            return None
+        
+        if (
+            jwt_settings.TOKEN_TYPE_CLAIM is not None
+            and payload.get(jwt_settings.TOKEN_TYPE_CLAIM) != AccessToken.token_type
+        ):
+            return None
+    
+    if len(_verified_tokens) >= VERIFIED_TOKEN_CACHE_MAX_SIZE:
+        _verified_tokens.clear()
+    _verified_tokens[digest] = payload
+    
+    return payload
+
+
+def _user_cache_key(user_id):
+    return f"ws_user:{user_id}"
+
+
+def get_cached_token_user(access_token):
+    """
+    Return the cached user for a validated token payload, or None on a miss.
+    The cache is shared (Redis), so call this off the event loop.
+    """
+    user_id = access_token.get('user_id')
+    return cache.get(_user_cache_key(user_id)) if user_id is not None else None
+
+
+def fetch_token_user(access_token):
+    """
+    Load the active user for a validated token payload from the database and
+    cache it for reconnects. The entry is keyed by user, so saving or
+    deleting the user drops it (see invalidate_token_user).
+    
+    Returns:
+        User instance, or None if the user no longer exists or is inactive
+    """
+    user = User.objects.only(*WS_USER_FIELDS).filter(
+        id=access_token.get('user_id'), is_active=True
+    ).first()
+    
+    if user is not None:
+        cache.set(_user_cache_key(user.id), user, timeout=WS_USER_CACHE_TTL)
+    
+    return user
+
+
+def get_token_user(access_token):
+    """
+    Return the active user for a validated access token payload (or AccessToken),
+    using a short-lived per-user cache so reconnects skip the database.
+    
+    Returns:
+        User instance, or None if the user no longer exists or is inactive
+    """
+    return get_cached_token_user(access_token) or fetch_token_user(access_token)
+
+
+def invalidate_token_user(user_id):
+    """
+    Drop a cached WebSocket user now and again once the transaction commits
+    (e.g. when the user is deactivated, deleted or changes role).
+    """
+    key = _user_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
 
 class JWTAuthMiddleware(BaseMiddleware):
     """
@@ -37,24 +219,19 @@ class JWTAuthMiddleware(BaseMiddleware):
         Main middleware entry point.
         Extracts token, validates it, and attaches user to scope.
         """
-        # Extract query string parameters
-        query_string = scope.get('query_string', b'').decode('utf-8')
-        query_params = parse_qs(query_string)
+        query_string = scope.get('query_string', b'')
         
         # Try to get token from query string
-        token = None
-        token_list = query_params.get('token', [])
-        if token_list:
-            token = token_list[0]
+        token = query_param(query_string, b'token')
         
         # Authenticate user
         if token:
             scope['user'] = await self.get_user_from_token(token)
         else:
             # Check for static API token (for service-to-service communication)
-            static_token_list = query_params.get('api_token', [])
-            if static_token_list and settings.STATIC_API_TOKEN:
-                if static_token_list[0] == settings.STATIC_API_TOKEN:
+            static_token = query_param(query_string, b'api_token')
+            if static_token and settings.STATIC_API_TOKEN:
+                if static_token == settings.STATIC_API_TOKEN:
                     # For static token, we might want to use a service user
                     # For now, set as anonymous but mark as authenticated
                     scope['user'] = AnonymousUser()
@@ -66,48 +243,42 @@ class JWTAuthMiddleware(BaseMiddleware):
 
         return await super().__call__(scope, receive, send)
 
-    @database_sync_to_async
-    def get_user_from_token(self, token):
+    async def get_user_from_token(self, token):
         """
         Validate JWT token and return the associated user.
         
+        Decoding runs on the event loop; the cache lookup and, on a miss,
+        the database fetch share a single hop to the thread pool.
+        
         Args:
             token: JWT access token string
             
         Returns:
             User instance if valid, AnonymousUser otherwise
         """
-        try:
-            # Validate the access token
-            access_token = AccessToken(token)
-            
-            # Get user ID from token payload
-            user_id = access_token.get('user_id')
-            
-            if user_id is None:
-                logger.warning("JWT token missing user_id claim")
-                return AnonymousUser()
-            
-            # Fetch user from database
-            user = User.objects.get(id=user_id)
-            
-            # Check if user is active
-            if not user.is_active:
-                logger.warning(f"Inactive user attempted WebSocket connection: {user_id}")
-                return AnonymousUser()
-            
-            logger.debug(f"WebSocket authenticated user: {user.username}")
-            return user
-            
-        except (InvalidToken, TokenError) as e:
-            logger.warning(f"Invalid JWT token for WebSocket: {str(e)}")
+        # Validate the access token
+        access_token = decode_access_token(token)
+        
+        if access_token is None:
+            logger.warning("Invalid JWT token for WebSocket")
             return AnonymousUser()
-        except User.DoesNotExist:
-            logger.warning(f"User not found for JWT token")
+        
+        # Get user ID from token payload
+        user_id = access_token.get('user_id')
+        
+        if user_id is None:
+            logger.warning("JWT token missing user_id claim")
             return AnonymousUser()
-        except Exception as e:
-            logger.error(f"Unexpected error in JWT WebSocket auth: {str(e)}")
+        
+        # Fetch active user from cache, then database
+        user = await database_sync_to_async(get_token_user)(access_token)
+        
+        if user is None:
+            logger.warning(f"No active user for WebSocket JWT token: {user_id}")
             return AnonymousUser()
+        
+        logger.debug("WebSocket authenticated user: %s", user.username)
+        return user
 
 
 class TokenAuthMiddleware(BaseMiddleware):
@@ -117,44 +288,27 @@ class TokenAuthMiddleware(BaseMiddleware):
     """
 
     async def __call__(self, scope, receive, send):
-        # Check headers for token
-        headers = dict(scope.get('headers', []))
-        auth_header = headers.get(b'authorization', b'').decode('utf-8')
+        # Check headers for token, falling back to query string
+        token = bearer_token(scope.get('headers', ())) or query_param(
+            scope.get('query_string', b''), b'token'
+        )
         
-        if auth_header.startswith('Bearer '):
-            token = auth_header[7:]  # Remove 'Bearer ' prefix
+        if token:
             scope['user'] = await self.get_user_from_token(token)
         else:
-            # Fall back to query string
-            query_string = scope.get('query_string', b'').decode('utf-8')
-            query_params = parse_qs(query_string)
-            token_list = query_params.get('token', [])
-            
-            if token_list:
-                scope['user'] = await self.get_user_from_token(token_list[0])
-            else:
-                scope['user'] = AnonymousUser()
+            scope['user'] = AnonymousUser()
 
         return await super().__call__(scope, receive, send)
 
-    @database_sync_to_async
-    def get_user_from_token(self, token):
+    async def get_user_from_token(self, token):
         """Validate token and return user."""
-        try:
-            access_token = AccessToken(token)
-            user_id = access_token.get('user_id')
-            
-            if user_id is None:
-                return AnonymousUser()
-            
-            user = User.objects.get(id=user_id)
-            return user if user.is_active else AnonymousUser()
-            
-        except (InvalidToken, TokenError, User.DoesNotExist):
-            return AnonymousUser()
-        except Exception as e:
-            logger.error(f"Token auth error: {str(e)}")
+        access_token = decode_access_token(token)
+        
+        if access_token is None or access_token.get('user_id') is None:
             return AnonymousUser()
+        
+        user = await database_sync_to_async(get_token_user)(access_token)
+        return user or AnonymousUser()
 
 
 def JWTAuthMiddlewareStack(inner):
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:01
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Substr
+
+
+def backfill_room_metadata(apps, schema_editor):
+    ChatRoom = apps.get_model("chat", "ChatRoom")
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+    ChatRoomMembership = apps.get_model("chat", "ChatRoomMembership")
+
+    last_messages = ChatMessage.objects.filter(
+        room=OuterRef("pk"), is_deleted=False
+    ).order_by("-created_at")
+    ChatRoom.objects.update(
+        last_message_id=Subquery(last_messages.values("id")[:1]),
+        last_message_preview=Coalesce(
+            Subquery(last_messages.annotate(preview=Substr("content", 1, 120)).values("preview")[:1]),
+            models.Value(""),
+        ),
+        last_message_sender_username=Coalesce(
+            Subquery(last_messages.values("sender__username")[:1]),
+            models.Value(""),
+        ),
+        last_message_at=Subquery(last_messages.values("created_at")[:1]),
+    )
+
+    ChatRoomMembership.objects.update(
+        unread_count=Coalesce(
+            Subquery(
+                ChatMessage.objects.filter(
+                    room=OuterRef("room"),
+                    is_deleted=False,
+                    created_at__gt=OuterRef("last_read_at"),
+                )
+                .exclude(sender=OuterRef("user"))
+                .order_by()
+                .values("room")
+                .annotate(count=Count("id"))
+                .values("count")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatroom",
+            name="last_message_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="last_message_id",
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="last_message_preview",
+            field=models.CharField(blank=True, max_length=120),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="last_message_sender_username",
+            field=models.CharField(blank=True, max_length=150),
+        ),
+        migrations.AddField(
+            model_name="chatroommembership",
+            name="unread_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Messages from others since last_read_at, maintained on write",
+            ),
+        ),
+        migrations.RunPython(backfill_room_metadata, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0003_denormalized_room_metadata"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="chatmessage",
+            name="chat_messag_room_id_cc7f0e_idx",
+        ),
+        migrations.AlterField(
+            model_name="chatmessage",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["room", "-created_at"],
+                name="cm_room_live",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0005_message_uuid7_ids"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="chatroommembership",
+            name="chat_room_m_user_id_4d45e2_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="chatroommembership",
+            name="chat_room_m_last_re_95dcf8_idx",
+        ),
+        migrations.AddIndex(
+            model_name="chatroommembership",
+            index=models.Index(
+                fields=["room", "user"], name="chat_room_m_room_id_5931c7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatroommembership",
+            index=models.Index(
+                fields=["room", "last_read_at"], name="chat_room_m_room_id_b5a706_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:41
+
+from django.db import migrations
+
+
+def create_trigram_index(apps, schema_editor):
+    # pg_trgm lets Postgres serve content__icontains (ILIKE '%q%') from an
+    # index; other backends keep the sequential scan
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS chatmsg_content_trgm ON chat_messages "
+        "USING gin (content gin_trgm_ops) WHERE NOT is_deleted"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS chatmsg_content_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_membership_room_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0007_message_content_trigram_index"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="chatmessage",
+            name="cm_room_live",
+        ),
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["room", "-created_at", "-id"],
+                name="cm_room_live",
+            ),
+        ),
+    ]
@@ -10,6 +10,9 @@ import uuid
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+from core.models import uuid7
 
 
 class ChatRoom(models.Model):
@@ -78,6 +81,12 @@ class ChatRoom(models.Model):
         blank=True,
         help_text="Unique identifier for WebSocket channel"
     )
+    
+    # Denormalized latest message, maintained by ChatMessageService
+    last_message_id = models.UUIDField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=120, blank=True)
+    last_message_sender_username = models.CharField(max_length=150, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     class Meta:
         db_table = 'chat_rooms'
@@ -100,23 +109,49 @@ class ChatRoom(models.Model):
             self.slug = str(uuid.uuid4())[:12]
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def group_name_for(room_id):
+        """Channel layer group name for a room ID, without loading the room."""
+        return f"chat_{room_id}"
+
     @property
     def channel_group_name(self):
         """
         Generate unique channel layer group name.
         Used by Django Channels for broadcasting messages.
         """
-        return f"chat_{self.slug}"
+        return self.group_name_for(self.id)
 
     def get_participant_ids(self):
         """Return list of participant user IDs."""
         return list(self.participants.values_list('id', flat=True))
 
-    def is_participant(self, user):
-        """Check if user is a participant in this room."""
+    def is_participant(self, user, *, cached_ids=None):
+        """
+        Check if user is a participant in this room.
+        Pass a preloaded set of participant IDs as cached_ids to skip the query.
+        """
         if self.room_type == self.RoomType.GLOBAL:
             return True  # Everyone can access global chat
-        return self.participants.filter(id=user.id).exists()
+        if cached_ids is not None:
+            return user.id in cached_ids
+        return self.get_membership(user) is not None
+
+    def get_membership(self, user):
+        """
+        Return the user's membership in this room, or None.
+        Memoized on the instance, so access and role checks made against the
+        same room object (one request) share a single query.
+        """
+        if not hasattr(self, '_membership_cache'):
+            self._membership_cache = {}
+        if user.id not in self._membership_cache:
+            self._membership_cache[user.id] = self.memberships.filter(user_id=user.id).first()
+        return self._membership_cache[user.id]
+
+    def clear_membership_cache(self):
+        """Forget memberships memoized by get_membership."""
+        self._membership_cache = {}
 
 
 class ChatRoomMembership(models.Model):
@@ -148,6 +183,10 @@ class ChatRoomMembership(models.Model):
         default=False,
         help_text="If true, user won't receive notifications"
     )
+    unread_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Messages from others since last_read_at, maintained on write"
+    )
     
     # Role within the room (optional for moderation)
     class RoomRole(models.TextChoices):
@@ -164,18 +203,21 @@ class ChatRoomMembership(models.Model):
     class Meta:
         db_table = 'chat_room_memberships'
         unique_together = ['user', 'room']
+        # (user, room) lookups use the unique_together index; these serve
+        # per-room participant lists and read-watermark comparisons
         indexes = [
-            models.Index(fields=['user', 'room']),
-            models.Index(fields=['last_read_at']),
+            models.Index(fields=['room', 'user']),
+            models.Index(fields=['room', 'last_read_at']),
         ]
 
     def __str__(self):
         return f"{self.user.username} in {self.room.name}"
 
     def mark_as_read(self):
-        """Update last_read_at timestamp."""
+        """Update last_read_at timestamp and reset the unread counter."""
         self.last_read_at = timezone.now()
-        self.save(update_fields=['last_read_at'])
+        self.unread_count = 0
+        self.save(update_fields=['last_read_at', 'unread_count'])
 
 
 class ChatMessage(models.Model):
@@ -190,9 +232,10 @@ class ChatMessage(models.Model):
         FILE = 'file', 'File Attachment'
         SYSTEM = 'system', 'System Message'
     
+    # Time-ordered UUIDs keep inserts on this write-heavy table append-only
     id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         editable=False
     )
     room = models.ForeignKey(
@@ -241,7 +284,7 @@ class ChatMessage(models.Model):
     )
     
     # Timestamps
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     # Soft delete
@@ -252,9 +295,16 @@ class ChatMessage(models.Model):
         db_table = 'chat_messages'
         ordering = ['created_at']
         indexes = [
-            models.Index(fields=['room', 'created_at']),
             models.Index(fields=['sender', 'created_at']),
+            # One (room, created_at DESC) btree serves both scan directions
             models.Index(fields=['room', '-created_at']),
+            # Live-message timeline and last-message lookups skip deleted rows;
+            # id matches the (created_at, id) keyset order so pages need no sort
+            models.Index(
+                fields=['room', '-created_at', '-id'],
+                condition=models.Q(is_deleted=False),
+                name='cm_room_live'
+            ),
         ]
 
     def __str__(self):
@@ -267,19 +317,27 @@ class ChatMessage(models.Model):
         self.is_deleted = True
         self.deleted_at = timezone.now()
         self.save(update_fields=['is_deleted', 'deleted_at'])
+        self.__dict__.pop('_ws_payload', None)
 
     def to_websocket_dict(self):
         """
         Convert message to dictionary for WebSocket transmission.
         This is the format sent to connected clients.
+        The dictionary is built once per instance and shared; don't mutate it.
         """
+        return self._ws_payload
+
+    @cached_property
+    def _ws_payload(self):
+        """Build the WebSocket payload dictionary (memoized)."""
+        sender = self.sender
         return {
             'id': str(self.id),
             'room_id': str(self.room_id),
             'sender': {
-                'id': self.sender.id if self.sender else None,
-                'username': self.sender.username if self.sender else 'System',
-                'full_name': self.sender.get_full_name() if self.sender else 'System',
+                'id': sender.id if sender else None,
+                'username': sender.username if sender else 'System',
+                'full_name': (sender.full_name or sender.username) if sender else 'System',
             },
             'message_type': self.message_type,
             'content': self.content if not self.is_deleted else '[Message deleted]',
@@ -294,7 +352,8 @@ class ChatMessage(models.Model):
 class MessageReadStatus(models.Model):
     """
     Tracks which users have read which messages.
-    Used for read receipts in private chats.
+    Legacy: read receipts are derived from ChatRoomMembership.last_read_at;
+    rows are only written when settings.CHAT_MESSAGE_READ_ROWS is enabled.
     """
     
     id = models.UUIDField(
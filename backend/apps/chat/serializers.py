@@ -8,26 +8,46 @@ Provides serialization for:
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch, prefetch_related_objects
 
 from .models import ChatRoom, ChatMessage, ChatRoomMembership, MessageReadStatus
 
 User = get_user_model()
 
+# Global rooms count every active user; cache the count instead of
+# scanning the user table on every room list
+ACTIVE_USER_COUNT_CACHE_KEY = 'active_user_count'
+ACTIVE_USER_COUNT_CACHE_TTL = 60
+
+# Shared part of the global room detail (everything but the caller's own
+# membership); dropped when the room or any membership changes
+GLOBAL_ROOM_CACHE_KEY = 'chat_global_room_detail'
+GLOBAL_ROOM_CACHE_TTL = 300
+
+# Active users for the chat sidebar, shared by all callers (each response
+# drops the caller); dropped when a listed user field changes
+CHAT_USER_LIST_CACHE_KEY = 'chat_user_list'
+CHAT_USER_LIST_CACHE_TTL = 300
+CHAT_USER_LIST_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name')
+
 
 class UserMinimalSerializer(serializers.ModelSerializer):
     """
     Minimal user serializer for chat context.
     """
-    full_name = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ['id', 'username', 'full_name', 'email']
         read_only_fields = fields
 
-    def get_full_name(self, obj):
-        """Get user's full name or username."""
-        return obj.get_full_name() or obj.username
+    def to_representation(self, instance):
+        """Fall back to username when no full name is stored."""
+        data = super().to_representation(instance)
+        data['full_name'] = data['full_name'] or instance.username
+        return data
 
 
 class ChatRoomMembershipSerializer(serializers.ModelSerializer):
@@ -42,7 +62,8 @@ class ChatRoomMembershipSerializer(serializers.ModelSerializer):
             'id', 'user', 'joined_at', 'last_read_at',
             'is_muted', 'room_role'
         ]
-        read_only_fields = ['id', 'user', 'joined_at']
+        # Output only; skips building validators and querysets per instance
+        read_only_fields = fields
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
@@ -60,9 +81,8 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             'attachment', 'attachment_name', 'reply_to', 'reply_to_preview',
             'created_at', 'updated_at', 'is_deleted', 'is_own_message'
         ]
-        read_only_fields = [
-            'id', 'room', 'sender', 'created_at', 'updated_at', 'is_deleted'
-        ]
+        # Output only (writes go through ChatMessageCreateSerializer)
+        read_only_fields = fields
 
     def get_reply_to_preview(self, obj):
         """Get preview of replied message."""
@@ -84,6 +104,75 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         return False
 
 
+# Columns read by serialize_message_rows, for both the REST and WebSocket
+# (services.websocket_dicts_from_rows) message payloads
+MESSAGE_ROW_FIELDS = (
+    'id', 'room_id', 'message_type', 'content', 'attachment', 'attachment_name',
+    'created_at', 'updated_at', 'is_deleted',
+    'sender_id', 'sender__username', 'sender__full_name', 'sender__email',
+    'reply_to_id', 'reply_to__content', 'reply_to__sender__username',
+)
+
+
+def serialize_message_rows(rows, request=None) -> list:
+    """
+    Build ChatMessageSerializer-compatible dicts from values() rows.
+    
+    Used by high-volume list endpoints to skip model instantiation and
+    per-field serializer dispatch; output matches ChatMessageSerializer.
+    
+    Args:
+        rows: Iterable of dicts from ChatMessage.objects.values(*MESSAGE_ROW_FIELDS)
+        request: Current request, for is_own_message and absolute attachment URLs
+        
+    Returns:
+        List of message dicts
+    """
+    user_id = request.user.id if request and request.user.is_authenticated else None
+    results = []
+    
+    for row in rows:
+        sender_id = row['sender_id']
+        attachment = row['attachment']
+        if attachment:
+            attachment = default_storage.url(attachment)
+            if request is not None:
+                attachment = request.build_absolute_uri(attachment)
+        
+        reply_to_id = row['reply_to_id']
+        reply_to_preview = None
+        if reply_to_id:
+            reply_content = row['reply_to__content']
+            reply_to_preview = {
+                'id': str(reply_to_id),
+                'sender_username': row['reply_to__sender__username'] or 'System',
+                'content_preview': (reply_content[:50] + '...') if len(reply_content) > 50 else reply_content,
+            }
+        
+        results.append({
+            'id': row['id'],
+            'room': row['room_id'],
+            'sender': {
+                'id': sender_id,
+                'username': row['sender__username'],
+                'full_name': row['sender__full_name'] or row['sender__username'],
+                'email': row['sender__email'],
+            } if sender_id is not None else None,
+            'message_type': row['message_type'],
+            'content': row['content'],
+            'attachment': attachment or None,
+            'attachment_name': row['attachment_name'],
+            'reply_to': reply_to_id,
+            'reply_to_preview': reply_to_preview,
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'is_deleted': row['is_deleted'],
+            'is_own_message': user_id is not None and sender_id == user_id,
+        })
+    
+    return results
+
+
 class ChatMessageCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating new messages via REST API.
@@ -104,6 +193,11 @@ class ChatRoomListSerializer(serializers.ModelSerializer):
     """
     Serializer for listing chat rooms.
     Includes unread count and last message preview.
+    
+    Expects the queryset built by ChatRoomListView, which annotates
+    participant_count and prefetches the current user's membership as
+    my_memberships. Last message and unread count come from the
+    denormalized room and membership columns.
     """
     participant_count = serializers.SerializerMethodField()
     last_message = serializers.SerializerMethodField()
@@ -122,18 +216,21 @@ class ChatRoomListSerializer(serializers.ModelSerializer):
     def get_participant_count(self, obj):
         """Get number of participants."""
         if obj.room_type == ChatRoom.RoomType.GLOBAL:
-            return User.objects.filter(is_active=True).count()
-        return obj.participants.count()
+            return cache.get_or_set(
+                ACTIVE_USER_COUNT_CACHE_KEY,
+                lambda: User.objects.filter(is_active=True).count(),
+                ACTIVE_USER_COUNT_CACHE_TTL
+            )
+        return obj.participant_count
 
     def get_last_message(self, obj):
         """Get last message in room."""
-        last_msg = obj.messages.filter(is_deleted=False).order_by('-created_at').first()
-        if last_msg:
+        if obj.last_message_id:
             return {
-                'id': str(last_msg.id),
-                'sender_username': last_msg.sender.username if last_msg.sender else 'System',
-                'content_preview': last_msg.content[:100] if last_msg.content else '[attachment]',
-                'created_at': last_msg.created_at.isoformat(),
+                'id': str(obj.last_message_id),
+                'sender_username': obj.last_message_sender_username or 'System',
+                'content_preview': obj.last_message_preview[:100] or '[attachment]',
+                'created_at': obj.last_message_at.isoformat(),
             }
         return None
 
@@ -146,17 +243,8 @@ class ChatRoomListSerializer(serializers.ModelSerializer):
         if obj.room_type == ChatRoom.RoomType.GLOBAL:
             return 0  # Global chat doesn't track unread
         
-        membership = ChatRoomMembership.objects.filter(
-            room=obj, user=request.user
-        ).first()
-        
-        if not membership:
-            return 0
-        
-        return obj.messages.filter(
-            is_deleted=False,
-            created_at__gt=membership.last_read_at
-        ).exclude(sender=request.user).count()
+        memberships = getattr(obj, 'my_memberships', None)
+        return memberships[0].unread_count if memberships else 0
 
     def get_is_member(self, obj):
         """Check if current user is a member."""
@@ -167,7 +255,7 @@ class ChatRoomListSerializer(serializers.ModelSerializer):
         if obj.room_type == ChatRoom.RoomType.GLOBAL:
             return True
         
-        return obj.participants.filter(id=request.user.id).exists()
+        return bool(obj.my_memberships)
 
 
 class ChatRoomDetailSerializer(serializers.ModelSerializer):
@@ -189,15 +277,32 @@ class ChatRoomDetailSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
+    @staticmethod
+    def prefetch(room):
+        """
+        Load the relations this serializer reads onto a room instance:
+        creator, participants and memberships with their users, in three
+        queries regardless of room size.
+        """
+        prefetch_related_objects(
+            [room],
+            'created_by',
+            'participants',
+            Prefetch('memberships', queryset=ChatRoomMembership.objects.select_related('user')),
+        )
+        return room
+
     def get_current_user_membership(self, obj):
         """Get current user's membership details."""
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return None
         
-        membership = ChatRoomMembership.objects.filter(
-            room=obj, user=request.user
-        ).first()
+        # Picked from the (prefetched) memberships rather than a new query
+        membership = next(
+            (m for m in obj.memberships.all() if m.user_id == request.user.id),
+            None
+        )
         
         if membership:
             return ChatRoomMembershipSerializer(membership).data
@@ -219,13 +324,17 @@ class CreatePrivateRoomSerializer(serializers.Serializer):
         if request and request.user.id == value:
             raise serializers.ValidationError("Cannot create private chat with yourself")
         
-        try:
-            User.objects.get(id=value, is_active=True)
-        except User.DoesNotExist:
-            raise serializers.ValidationError("User not found or inactive")
-        
         return value
 
+    def validate(self, attrs):
+        """Resolve the target user once; views read it as validated_data['user']."""
+        user = User.objects.filter(id=attrs['user_id'], is_active=True).first()
+        if user is None:
+            raise serializers.ValidationError({'user_id': ["User not found or inactive"]})
+        
+        attrs['user'] = user
+        return attrs
+
 
 class CreateProjectRoomSerializer(serializers.Serializer):
     """
@@ -256,13 +365,14 @@ class AddParticipantSerializer(serializers.Serializer):
         default='member'
     )
     
-    def validate_user_id(self, value):
-        """Validate user exists."""
-        try:
-            User.objects.get(id=value, is_active=True)
-        except User.DoesNotExist:
-            raise serializers.ValidationError("User not found or inactive")
-        return value
+    def validate(self, attrs):
+        """Resolve the user once; views read it as validated_data['user']."""
+        user = User.objects.filter(id=attrs['user_id'], is_active=True).first()
+        if user is None:
+            raise serializers.ValidationError({'user_id': ["User not found or inactive"]})
+        
+        attrs['user'] = user
+        return attrs
 
 
 class RoomSettingsSerializer(serializers.Serializer):
@@ -272,6 +382,17 @@ class RoomSettingsSerializer(serializers.Serializer):
     is_muted = serializers.BooleanField(required=False)
 
 
+class MarkRoomsReadSerializer(serializers.Serializer):
+    """
+    Serializer for marking several rooms as read at once.
+    """
+    room_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=500
+    )
+
+
 class MessageSearchSerializer(serializers.Serializer):
     """
     Serializer for message search parameters.
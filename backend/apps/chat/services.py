@@ -8,20 +8,100 @@ Handles all business logic for chat operations:
 - Access control
 """
 import logging
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone as dt_timezone
 from typing import Optional, List, Dict, Any, Tuple
 from uuid import UUID
 
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.db.models import Q, Max, Count, Subquery, OuterRef, Exists
+from django.db.models import (
+    Q, Max, Count, Subquery, OuterRef, Exists, F, Case, When, Value, DateTimeField
+)
+from django.db.models.functions import Coalesce, Substr
 from django.utils import timezone
 
+from apps.notification.models import Notification
+from apps.notification.services import bulk_create_notifications, opted_out_user_ids
 from .models import ChatRoom, ChatMessage, ChatRoomMembership, MessageReadStatus
+from .serializers import MESSAGE_ROW_FIELDS, serialize_message_rows
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Granted room access, shared by all processes through the Redis cache (see
+# CACHES in settings). Only positive results are stored so newly added
+# members are never denied by a stale entry; removals are invalidated by
+# membership signals.
+ACCESS_CACHE_TTL = 300
+
+# Active room rows for views that only need the room's identity; dropped
+# when a room is saved or deleted
+ROOM_CACHE_TTL = 300
+
+# Cached get_user_rooms payloads. Writes stamp the rooms and users they
+# affect after commit; an entry is served only if none of its rooms (or its
+# user) were stamped after it was computed. The skew margin covers clock
+# differences between processes.
+ROOM_LIST_CACHE_TTL = 300
+# The REST room list also carries the global room's active-user count,
+# which is only refreshed every minute, so its entries live no longer
+ROOM_LIST_API_CACHE_TTL = 60
+ROOM_STAMP_CACHE_TTL = 3600
+ROOM_STAMP_CLOCK_SKEW = 1.0
+
+# Open bounds for message cursors whose anchor doesn't exist
+CURSOR_MIN_TIME = datetime.min.replace(tzinfo=dt_timezone.utc)
+CURSOR_MAX_TIME = datetime.max.replace(tzinfo=dt_timezone.utc)
+
+# Columns ChatMessage.to_websocket_dict reads; keeps message queries from
+# pulling the full sender User row (password hash, profile fields, ...)
+WS_MESSAGE_FIELDS = (
+    'id', 'room', 'sender', 'message_type', 'content', 'attachment',
+    'attachment_name', 'reply_to', 'created_at', 'is_deleted',
+    'sender__username', 'sender__full_name',
+)
+
+def websocket_dicts_from_rows(rows) -> List[Dict[str, Any]]:
+    """
+    Build ChatMessage.to_websocket_dict payloads from values() rows.
+    
+    Read paths returning many messages use this to skip model
+    instantiation. Rows go through serialize_message_rows, the same builder
+    as the REST endpoints, and the WebSocket keys are picked from its
+    output; output matches to_websocket_dict.
+    
+    Args:
+        rows: Iterable of dicts from values(*MESSAGE_ROW_FIELDS)
+        
+    Returns:
+        List of message dicts
+    """
+    payload = []
+    for message in serialize_message_rows(rows):
+        sender = message['sender']
+        reply_to_id = message['reply_to']
+        payload.append({
+            'id': str(message['id']),
+            'room_id': str(message['room']),
+            'sender': {
+                'id': sender['id'],
+                'username': sender['username'],
+                'full_name': sender['full_name'],
+            } if sender is not None else {'id': None, 'username': 'System', 'full_name': 'System'},
+            'message_type': message['message_type'],
+            'content': message['content'] if not message['is_deleted'] else '[Message deleted]',
+            'attachment_url': message['attachment'],
+            'attachment_name': message['attachment_name'],
+            'reply_to': str(reply_to_id) if reply_to_id else None,
+            'created_at': message['created_at'].isoformat(),
+            'is_deleted': message['is_deleted'],
+        })
+    return payload
+
 
 class ChatRoomService:
     """
@@ -82,19 +162,34 @@ class ChatRoomService:
         if created:
             logger.info(f"Project chat room created for project {project.id}: {room.id}")
             
-            # Add project members as participants
-            # Assuming Project has a members field or similar
+            # Add project members and the creator in one INSERT
+            member_ids = {created_by.id}
             if hasattr(project, 'members'):
-                for member in project.members.all():
-                    ChatRoomService.add_participant(room, member)
+                member_ids.update(project.members.values_list('id', flat=True))
             
-            # Always add the creator
-            ChatRoomService.add_participant(room, created_by)
+            existing = set(
+                ChatRoomMembership.objects.filter(
+                    room=room,
+                    user_id__in=member_ids
+                ).values_list('user_id', flat=True)
+            )
+            new_ids = member_ids - existing
+            ChatRoomMembership.objects.bulk_create(
+                [
+                    ChatRoomMembership(room=room, user_id=user_id, room_role='member')
+                    for user_id in new_ids
+                ],
+                ignore_conflicts=True
+            )
+            
+            # bulk_create skips post_save, so drop cached access by hand
+            for user_id in new_ids:
+                ChatRoomService.invalidate_room_access(room.id, user_id)
+            ChatRoomService.touch_room_lists(user_ids=new_ids)
         
         return room
 
     @staticmethod
-    @transaction.atomic
     def get_or_create_private_room(user1, user2) -> Tuple[ChatRoom, bool]:
         """
         Get or create a private chat room between two users.
@@ -106,27 +201,33 @@ class ChatRoomService:
         Returns:
             Tuple of (ChatRoom instance, created boolean)
         """
-        # Check for existing room with both participants
+        # Check for existing room with both participants; EXISTS probes on
+        # the (room, user) index instead of joining memberships twice
         existing_room = ChatRoom.objects.filter(
-            room_type=ChatRoom.RoomType.PRIVATE,
-            participants=user1
-        ).filter(
-            participants=user2
+            Exists(ChatRoomMembership.objects.filter(room=OuterRef('pk'), user=user1)),
+            Exists(ChatRoomMembership.objects.filter(room=OuterRef('pk'), user=user2)),
+            room_type=ChatRoom.RoomType.PRIVATE
         ).first()
         
         if existing_room:
             return existing_room, False
         
-        # Create new private room
-        room = ChatRoom.objects.create(
-            room_type=ChatRoom.RoomType.PRIVATE,
-            name=f"Chat: {user1.username} & {user2.username}",
-            created_by=user1,
-        )
-        
-        # Add both participants
-        ChatRoomMembership.objects.create(user=user1, room=room)
-        ChatRoomMembership.objects.create(user=user2, room=room)
+        # Only the create path needs a transaction
+        with transaction.atomic():
+            # Create new private room
+            room = ChatRoom.objects.create(
+                room_type=ChatRoom.RoomType.PRIVATE,
+                name=f"Chat: {user1.username} & {user2.username}",
+                created_by=user1,
+            )
+            
+            # Add both participants in one INSERT. No post_save runs, which is
+            # fine: nothing can have cached access to a room created just now.
+            ChatRoomMembership.objects.bulk_create([
+                ChatRoomMembership(user=user1, room=room),
+                ChatRoomMembership(user=user2, room=room),
+            ])
+            ChatRoomService.touch_room_lists(user_ids=[user1.id, user2.id])
         
         logger.info(f"Private room created between {user1.id} and {user2.id}: {room.id}")
         
@@ -152,7 +253,8 @@ class ChatRoomService:
         )
         
         if created:
-            logger.debug(f"User {user.id} added to room {room.id}")
+            room.clear_membership_cache()
+            logger.debug("User %s added to room %s", user.id, room.id)
         
         return membership
 
@@ -174,7 +276,8 @@ class ChatRoomService:
         ).delete()
         
         if deleted:
-            logger.debug(f"User {user.id} removed from room {room.id}")
+            room.clear_membership_cache()
+            logger.debug("User %s removed from room %s", user.id, room.id)
         
         return deleted > 0
 
@@ -190,38 +293,44 @@ class ChatRoomService:
         Returns:
             List of room dictionaries with metadata
         """
+        cache_key = ChatRoomService.room_list_cache_key(user.id)
+        if not room_type:
+            cached = ChatRoomService.get_cached_room_list(cache_key, user.id)
+            if cached is not None:
+                return cached
+        computed_at = time.time()
+        
         # Base query for rooms user has access to
         rooms_query = ChatRoom.objects.filter(is_active=True)
         
         if room_type:
             rooms_query = rooms_query.filter(room_type=room_type)
         
-        # Filter based on room type
+        # Filter based on room type; the membership semi-join avoids a
+        # participants join and the DISTINCT it would need
         rooms_query = rooms_query.filter(
             Q(room_type=ChatRoom.RoomType.GLOBAL) |
-            Q(participants=user)
-        ).distinct()
+            Exists(ChatRoomMembership.objects.filter(room=OuterRef('pk'), user=user))
+        ).annotate(
+            my_unread_count=Subquery(
+                ChatRoomMembership.objects.filter(
+                    room=OuterRef('pk'), user=user
+                ).values('unread_count')[:1]
+            )
+        ).only(
+            'id', 'name', 'room_type', 'slug', 'project', 'updated_at', 'last_message_id'
+        ).order_by(F('last_message_at').desc(nulls_last=True))
+        
+        rooms_list = list(rooms_query)
+        
+        # Hydrate denormalized last messages in one query
+        last_messages = ChatMessage.objects.select_related('sender').only(*WS_MESSAGE_FIELDS).in_bulk(
+            [room.last_message_id for room in rooms_list if room.last_message_id]
+        )
         
-        # Annotate with last message and unread count
         rooms = []
-        for room in rooms_query:
-            # Get last message
-            last_message = room.messages.filter(
-                is_deleted=False
-            ).order_by('-created_at').first()
-            
-            # Get unread count for non-global rooms
-            unread_count = 0
-            if room.room_type != ChatRoom.RoomType.GLOBAL:
-                membership = ChatRoomMembership.objects.filter(
-                    room=room, user=user
-                ).first()
-                
-                if membership:
-                    unread_count = room.messages.filter(
-                        is_deleted=False,
-                        created_at__gt=membership.last_read_at
-                    ).exclude(sender=user).count()
+        for room in rooms_list:
+            last_message = last_messages.get(room.last_message_id)
             
             rooms.append({
                 'id': str(room.id),
@@ -230,15 +339,96 @@ class ChatRoomService:
                 'slug': room.slug,
                 'project_id': str(room.project_id) if room.project_id else None,
                 'last_message': last_message.to_websocket_dict() if last_message else None,
-                'unread_count': unread_count,
+                # Global chat doesn't track unread
+                'unread_count': (
+                    room.my_unread_count or 0
+                    if room.room_type != ChatRoom.RoomType.GLOBAL else 0
+                ),
                 'updated_at': room.updated_at.isoformat(),
             })
         
-        # Sort by last message time
-        rooms.sort(key=lambda x: x['last_message']['created_at'] if x['last_message'] else '', reverse=True)
+        if not room_type:
+            ChatRoomService.cache_room_list(
+                cache_key, computed_at, [room['id'] for room in rooms], rooms
+            )
         
         return rooms
 
+    @staticmethod
+    def room_list_cache_key(user_id):
+        """Cache key for a user's get_user_rooms payload."""
+        return f"chat_rooms:{user_id}"
+
+    @staticmethod
+    def room_list_api_cache_key(user_id, room_type=None, project_id=None):
+        """Cache key for a user's ChatRoomListView response under given filters."""
+        return f"chat_rooms_api:{user_id}:{room_type or ''}:{project_id or ''}"
+
+    @staticmethod
+    def _room_stamp_keys(room_ids=(), user_ids=(), all_lists=False) -> List[str]:
+        return (
+            [f"chat_rooms_stamp:room:{room_id}" for room_id in room_ids] +
+            [f"chat_rooms_stamp:user:{user_id}" for user_id in user_ids] +
+            (["chat_rooms_stamp:all"] if all_lists else [])
+        )
+
+    @staticmethod
+    def get_cached_room_list(cache_key, user_id) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return a room list cached with cache_room_list if none of its rooms,
+        nor the user's own memberships, changed since it was built, and no
+        change marked every list stale.
+        """
+        entry = cache.get(cache_key)
+        if entry is None:
+            return None
+        
+        stamps = cache.get_many(
+            ChatRoomService._room_stamp_keys(entry['room_ids'], [user_id], all_lists=True)
+        )
+        fresh_before = entry['computed_at'] - ROOM_STAMP_CLOCK_SKEW
+        if any(stamp >= fresh_before for stamp in stamps.values()):
+            return None
+        return entry['rooms']
+
+    @staticmethod
+    def cache_room_list(cache_key, computed_at, room_ids, rooms, timeout=ROOM_LIST_CACHE_TTL):
+        """
+        Cache a user's room list for get_cached_room_list.
+        
+        Args:
+            cache_key: Key for this list (one per user and filter)
+            computed_at: time.time() taken before the rooms were queried
+            room_ids: IDs of the rooms in the list, as strings
+            rooms: The payload to cache
+            timeout: Cache TTL in seconds
+        """
+        cache.set(
+            cache_key,
+            {'computed_at': computed_at, 'room_ids': room_ids, 'rooms': rooms},
+            timeout
+        )
+
+    @staticmethod
+    def touch_room_lists(room_ids=(), user_ids=(), all_lists=False):
+        """
+        Mark cached room lists stale once the current transaction commits:
+        every list that includes one of room_ids, and the lists of user_ids.
+        
+        Args:
+            room_ids: Rooms whose metadata, last message or counters changed
+            user_ids: Users whose memberships or read state changed
+            all_lists: Mark every cached list stale (e.g. a global room was
+                created, which reaches all users without a membership)
+        """
+        keys = ChatRoomService._room_stamp_keys(
+            [str(room_id) for room_id in room_ids], user_ids, all_lists
+        )
+        if keys:
+            transaction.on_commit(
+                lambda: cache.set_many(dict.fromkeys(keys, time.time()), ROOM_STAMP_CACHE_TTL)
+            )
+
     @staticmethod
     def check_room_access(room: ChatRoom, user) -> bool:
         """
@@ -261,11 +451,176 @@ class ChatRoomService:
             return True
         
         # Admin users have access to all rooms
-        if hasattr(user, 'role') and user.role == 'admin':
+        if getattr(user, 'role', None) == 'admin':
             return True
         
-        # Check membership for private and project rooms
-        return room.is_participant(user)
+        # Check membership for private and project rooms; grants are
+        # remembered so rapid back-to-back requests skip the membership query
+        if ChatRoomService.get_cached_room_access(room.id, user.id):
+            return True
+        if room.is_participant(user):
+            ChatRoomService.cache_room_access(room.id, user.id)
+            return True
+        return False
+
+    @staticmethod
+    def get_accessible_room(user, room_id) -> Tuple[Optional[ChatRoom], bool]:
+        """
+        Load an active room together with the user's access to it.
+        
+        Applies the same rules as check_room_access, but the membership
+        lookup rides along as a subquery in the room SELECT, so a room-scoped
+        request costs one query instead of two. The room is annotated with
+        user_unread_count: the user's unread counter, or None for non-members.
+        
+        Args:
+            user: Authenticated user requesting the room
+            room_id: ID of the room
+            
+        Returns:
+            Tuple of (room or None if it does not exist, has_access)
+        """
+        try:
+            room = ChatRoom.objects.annotate(
+                user_unread_count=Subquery(
+                    ChatRoomMembership.objects.filter(
+                        room=OuterRef('pk'), user=user
+                    ).values('unread_count')[:1]
+                )
+            ).get(id=room_id, is_active=True)
+        except ChatRoom.DoesNotExist:
+            return None, False
+        
+        if room.user_unread_count is not None:
+            ChatRoomService.cache_room_access(room.id, user.id)
+            return room, True
+        
+        return room, (
+            room.room_type == ChatRoom.RoomType.GLOBAL
+            or getattr(user, 'role', None) == 'admin'
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild_room_metadata(room_ids: Optional[List[UUID]] = None) -> int:
+        """
+        Recompute denormalized last-message fields and unread counters.
+        
+        Normal writes keep these columns current; this repairs drift left
+        by raw SQL, admin edits or bulk imports that bypass the services.
+        
+        Args:
+            room_ids: Optional list of room IDs to limit the rebuild to
+            
+        Returns:
+            Number of rooms updated
+        """
+        rooms = ChatRoom.objects.all()
+        memberships = ChatRoomMembership.objects.all()
+        if room_ids is not None:
+            rooms = rooms.filter(id__in=room_ids)
+            memberships = memberships.filter(room_id__in=room_ids)
+        
+        last_messages = ChatMessage.objects.filter(
+            room=OuterRef('pk'), is_deleted=False
+        ).order_by('-created_at')
+        updated = rooms.update(
+            last_message_id=Subquery(last_messages.values('id')[:1]),
+            last_message_preview=Coalesce(
+                Subquery(last_messages.annotate(preview=Substr('content', 1, 120)).values('preview')[:1]),
+                Value('')
+            ),
+            last_message_sender_username=Coalesce(
+                Subquery(last_messages.values('sender__username')[:1]),
+                Value('')
+            ),
+            last_message_at=Subquery(last_messages.values('created_at')[:1]),
+        )
+        
+        memberships.update(
+            unread_count=Coalesce(
+                Subquery(
+                    ChatMessage.objects.filter(
+                        room=OuterRef('room'),
+                        is_deleted=False,
+                        created_at__gt=OuterRef('last_read_at'),
+                    )
+                    .exclude(sender=OuterRef('user'))
+                    .order_by()
+                    .values('room')
+                    .annotate(count=Count('id'))
+                    .values('count')
+                ),
+                0
+            )
+        )
+        
+        ChatRoomService.touch_room_lists(room_ids=rooms.values_list('id', flat=True))
+        
+        return updated
+
+    @staticmethod
+    def room_access_cache_key(room_id, user_id):
+        """Cache key for a user's access grant to a room."""
+        return f"chat_room_access:{room_id}:{user_id}"
+
+    @staticmethod
+    def get_cached_room_access(room_id, user_id) -> bool:
+        """Return True if access was granted within ACCESS_CACHE_TTL seconds."""
+        return cache.get(ChatRoomService.room_access_cache_key(room_id, user_id), False)
+
+    @staticmethod
+    def cache_room_access(room_id, user_id):
+        """Remember that a user was granted access to a room."""
+        cache.set(ChatRoomService.room_access_cache_key(room_id, user_id), True, ACCESS_CACHE_TTL)
+
+    @staticmethod
+    def invalidate_room_access(room_id, user_id):
+        """
+        Drop a cached access grant (e.g. when membership changes).
+        
+        Dropped again on commit, so a grant re-cached by a concurrent request
+        that still saw the old membership doesn't outlive the change.
+        """
+        key = ChatRoomService.room_access_cache_key(room_id, user_id)
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.delete(key))
+
+    @staticmethod
+    def room_cache_key(room_id):
+        """Cache key for an active room row."""
+        return f"chat_room:{room_id}"
+
+    @staticmethod
+    def get_active_room(room_id) -> Optional[ChatRoom]:
+        """
+        Return an active room, shared by all processes through the Redis
+        cache (the chat.W001 deploy check flags a process-local one).
+        
+        For views that only read the room's identity (type, name, creator).
+        The denormalized last-message columns are updated without save() and
+        may be stale here, so don't save the returned instance.
+        
+        Args:
+            room_id: ID of the room
+            
+        Returns:
+            ChatRoom instance, or None if no active room has this ID
+        """
+        key = ChatRoomService.room_cache_key(room_id)
+        room = cache.get(key)
+        if room is None:
+            room = ChatRoom.objects.filter(id=room_id, is_active=True).first()
+            if room is not None:
+                cache.set(key, room, ROOM_CACHE_TTL)
+        return room
+
+    @staticmethod
+    def invalidate_room(room_id):
+        """Drop a cached room row now and again once the transaction commits."""
+        key = ChatRoomService.room_cache_key(room_id)
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.delete(key))
 
 
 class ChatMessageService:
@@ -309,17 +664,116 @@ class ChatMessageService:
             reply_to_id=reply_to_id
         )
         
-        # Update room's updated_at timestamp
-        room.updated_at = timezone.now()
-        room.save(update_fields=['updated_at'])
+        # Update room's last message, updated_at and members' unread counts
+        ChatMessageService._record_new_messages([message])
         
-        logger.debug(f"Message created in room {room.id} by user {sender.id}")
+        logger.debug("Message created in room %s by user %s", room.id, sender.id)
         
         # Trigger notification (async)
         ChatMessageService._send_notification(message)
         
         return message
 
+    @staticmethod
+    @transaction.atomic
+    def bulk_create_messages(messages: List[ChatMessage]) -> List[ChatMessage]:
+        """
+        Insert a batch of unsaved messages in a single transaction.
+
+        Args:
+            messages: Unsaved ChatMessage instances
+
+        Returns:
+            The saved ChatMessage instances, in the same order
+        """
+        created = ChatMessage.objects.bulk_create(messages)
+
+        # Update every affected room once instead of once per message
+        ChatMessageService._record_new_messages(created)
+
+        logger.debug("Bulk created %d messages", len(created))
+
+        for message in created:
+            ChatMessageService._send_notification(message)
+
+        return created
+
+    @staticmethod
+    def _record_new_messages(messages: List[ChatMessage]):
+        """
+        Maintain the denormalized last-message columns on ChatRoom and
+        unread counters on ChatRoomMembership for newly saved messages.
+        Issues one room UPDATE and one membership UPDATE per affected room.
+        
+        Args:
+            messages: Saved ChatMessage instances
+        """
+        by_room = defaultdict(list)
+        for message in messages:
+            by_room[message.room_id].append(message)
+        
+        for room_id, room_messages in by_room.items():
+            latest = max(room_messages, key=lambda m: m.created_at)
+            ChatRoom.objects.filter(id=room_id).update(
+                last_message_id=latest.id,
+                last_message_preview=latest.content[:120],
+                last_message_sender_username=latest.sender.username if latest.sender else '',
+                last_message_at=latest.created_at,
+                updated_at=timezone.now()
+            )
+            
+            # Every member gains the batch size, minus their own messages;
+            # members who sent the whole batch are left out of the UPDATE
+            # (for a single message that is the sender's row)
+            total = len(room_messages)
+            sent_by = Counter(m.sender_id for m in room_messages if m.sender_id)
+            ChatRoomMembership.objects.filter(room_id=room_id).exclude(
+                user_id__in=[user_id for user_id, count in sent_by.items() if count == total]
+            ).update(
+                unread_count=F('unread_count') + Case(
+                    *[When(user_id=user_id, then=Value(total - count))
+                      for user_id, count in sent_by.items()],
+                    default=Value(total)
+                )
+            )
+        
+        ChatRoomService.touch_room_lists(room_ids=by_room)
+
+    @staticmethod
+    def _record_deleted_message(message: ChatMessage):
+        """
+        Roll back the denormalized counters for a soft-deleted message:
+        decrement unread counts of members who had not read it yet and
+        repoint the room's last message if it was the one deleted.
+        
+        Args:
+            message: ChatMessage that was just soft-deleted
+        """
+        ChatRoomMembership.objects.filter(
+            room_id=message.room_id,
+            last_read_at__lt=message.created_at,
+            unread_count__gt=0
+        ).exclude(user_id=message.sender_id).update(
+            unread_count=F('unread_count') - 1
+        )
+        
+        latest = ChatMessage.objects.filter(
+            room_id=message.room_id,
+            is_deleted=False
+        ).select_related('sender').order_by('-created_at').first()
+        
+        ChatRoom.objects.filter(
+            id=message.room_id,
+            last_message_id=message.id
+        ).update(
+            last_message_id=latest.id if latest else None,
+            last_message_preview=latest.content[:120] if latest else '',
+            last_message_sender_username=latest.sender.username if latest and latest.sender else '',
+            last_message_at=latest.created_at if latest else None
+        )
+        
+        ChatRoomService.touch_room_lists(room_ids=[message.room_id])
+
     @staticmethod
     def _send_notification(message: ChatMessage):
         """
@@ -329,42 +783,48 @@ class ChatMessageService:
         Args:
             message: ChatMessage instance
         """
+        room = message.room
+        sender = message.sender
+        
+        if sender is None:
+            return  # System messages don't notify
+        
+        if room.room_type == ChatRoom.RoomType.GLOBAL:
+            return  # Skip notifications for global chat
+        
+        # Recipients: all participants except the sender who haven't turned
+        # chat notifications off, in one query
+        memberships = ChatRoomMembership.objects.filter(room_id=room.id).exclude(
+            user_id=sender.id
+        ).exclude(
+            user_id__in=opted_out_user_ids(Notification.NotificationType.CHAT_MESSAGE)
+        )
+        if room.room_type == ChatRoom.RoomType.PROJECT:
+            # Only notify unmuted members
+            memberships = memberships.filter(is_muted=False)
+        
+        recipient_ids = list(memberships.values_list('user_id', flat=True))
+        if not recipient_ids:
+            return
+        
+        title = f"New message from {sender.username}"
+        preview = message.content[:100]
+        
+        # Create notifications in one INSERT; a savepoint keeps a failure here
+        # from aborting the message transaction
         try:
-            # Import notification service - adjust import based on your notification app structure
-            from apps.notification.services import NotificationService
-            
-            room = message.room
-            sender = message.sender
-            
-            # Get recipients (all participants except sender)
-            if room.room_type == ChatRoom.RoomType.PRIVATE:
-                recipients = room.participants.exclude(id=sender.id)
-            elif room.room_type == ChatRoom.RoomType.PROJECT:
-                # Only notify unmuted members
-                memberships = ChatRoomMembership.objects.filter(
-                    room=room,
-                    is_muted=False
-                ).exclude(user=sender)
-                recipients = User.objects.filter(
-                    id__in=memberships.values_list('user_id', flat=True)
-                )
-            else:
-                # Global chat - might want to limit notifications
-                return  # Skip notifications for global chat
-            
-            # Create notifications
-            for recipient in recipients:
-                NotificationService.create_notification(
-                    recipient=recipient,
-                    title=f"New message from {sender.username}",
-                    message=message.content[:100],
-                    notification_type='chat_message',
-                    related_object_id=str(message.id),
-                    related_object_type='chat_message'
-                )
-                
-        except ImportError:
-            logger.warning("Notification app not available, skipping message notification")
+            with transaction.atomic():
+                bulk_create_notifications([
+                    {
+                        'recipient_id': recipient_id,
+                        'title': title,
+                        'message': preview,
+                        'notification_type': Notification.NotificationType.CHAT_MESSAGE,
+                        'actor': sender,
+                        'related_object': message,
+                    }
+                    for recipient_id in recipient_ids
+                ], batch_size=500)
         except Exception as e:
             logger.error(f"Failed to send chat notification: {str(e)}")
 
@@ -391,25 +851,63 @@ class ChatMessageService:
         """
         query = room.messages.filter(is_deleted=False)
         
+        query = ChatMessageService.apply_cursor(query, room.id, before=before, after=after)
+        
+        # Order by most recent first for pagination, then reverse; rows are
+        # read as plain dicts with the sender joined
+        rows = query.order_by('-created_at', '-id').values(*MESSAGE_ROW_FIELDS)[:limit]
+        payload = websocket_dicts_from_rows(rows)
+        payload.reverse()
+        
+        return payload
+
+    @staticmethod
+    def apply_cursor(
+        queryset,
+        room_id,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ):
+        """
+        Keyset-paginate a message queryset on (created_at, id).
+        
+        The anchor's created_at is read by a subquery in the same SELECT
+        instead of a separate lookup. Each bound is an inclusive range on
+        created_at (index-friendly) with ties on the anchor's timestamp
+        broken by id. Anchors are looked up in the room only; an unknown
+        anchor (e.g. a purged message) leaves that bound open, like no
+        cursor at all.
+        
+        Args:
+            queryset: ChatMessage queryset
+            room_id: Room the anchors must belong to
+            before: Keep messages before this message ID
+            after: Keep messages after this message ID
+            
+        Returns:
+            Filtered queryset
+        """
+        anchors = ChatMessage.objects.filter(room_id=room_id)
+        
         if before:
-            try:
-                before_msg = ChatMessage.objects.get(id=before)
-                query = query.filter(created_at__lt=before_msg.created_at)
-            except ChatMessage.DoesNotExist:
-                pass
+            before_at = Coalesce(
+                Subquery(anchors.filter(id=before).values('created_at')[:1]),
+                Value(CURSOR_MAX_TIME, output_field=DateTimeField())
+            )
+            queryset = queryset.filter(created_at__lte=before_at).exclude(
+                created_at=before_at, id__gte=before
+            )
         
         if after:
-            try:
-                after_msg = ChatMessage.objects.get(id=after)
-                query = query.filter(created_at__gt=after_msg.created_at)
-            except ChatMessage.DoesNotExist:
-                pass
-        
-        # Order by most recent first for pagination, then reverse
-        messages = query.order_by('-created_at')[:limit]
-        messages = list(reversed(messages))
+            after_at = Coalesce(
+                Subquery(anchors.filter(id=after).values('created_at')[:1]),
+                Value(CURSOR_MIN_TIME, output_field=DateTimeField())
+            )
+            queryset = queryset.filter(created_at__gte=after_at).exclude(
+                created_at=after_at, id__lte=after
+            )
         
-        return [msg.to_websocket_dict() for msg in messages]
+        return queryset
 
     @staticmethod
     def mark_messages_as_read(room: ChatRoom, user) -> int:
@@ -423,30 +921,96 @@ class ChatMessageService:
         Returns:
             Number of messages marked as read
         """
-        # Update membership last_read_at
         membership = ChatRoomMembership.objects.filter(
             room=room,
             user=user
-        ).first()
+        ).only('id', 'last_read_at', 'unread_count').first()
         
-        if membership:
-            membership.mark_as_read()
+        if not membership or not membership.unread_count:
+            # Nothing from others past the watermark; skip the write. Message
+            # lists call this on every page load, so this is the common case.
+            return 0
+        
+        # The membership's last_read_at is the read watermark: every message
+        # created before it counts as read, so marking a room read is a single
+        # UPDATE no matter how many messages it covers.
+        previous_read_at = membership.last_read_at
+        marked = membership.unread_count
+        membership.mark_as_read()
+        ChatRoomService.touch_room_lists(user_ids=[user.id])
+        
+        # Legacy per-message receipt rows, only when explicitly enabled
+        if getattr(settings, 'CHAT_MESSAGE_READ_ROWS', False):
+            MessageReadStatus.objects.bulk_create(
+                [
+                    MessageReadStatus(message_id=message_id, user=user)
+                    for message_id in room.messages.filter(
+                        created_at__gt=previous_read_at,
+                        created_at__lte=membership.last_read_at,
+                        is_deleted=False
+                    ).exclude(sender=user).values_list('id', flat=True)
+                ],
+                ignore_conflicts=True,
+                batch_size=500
+            )
+        
+        return marked
+
+    @staticmethod
+    @transaction.atomic
+    def mark_rooms_as_read(user, room_ids: List[UUID]) -> int:
+        """
+        Mark several rooms as read with a single membership UPDATE.
         
-        # For detailed read receipts (optional)
-        unread_messages = room.messages.filter(
-            created_at__gt=membership.last_read_at if membership else timezone.now()
-        ).exclude(sender=user)
+        Args:
+            user: User marking rooms as read
+            room_ids: IDs of rooms to mark; rooms the user is not a member of are skipped
+            
+        Returns:
+            Number of rooms marked as read
+        """
+        now = timezone.now()
         
-        # Create read statuses
-        read_statuses = []
-        for msg in unread_messages:
-            if not MessageReadStatus.objects.filter(message=msg, user=user).exists():
-                read_statuses.append(MessageReadStatus(message=msg, user=user))
+        # Legacy per-message receipt rows, only when explicitly enabled
+        if getattr(settings, 'CHAT_MESSAGE_READ_ROWS', False):
+            unread_ids = ChatMessage.objects.filter(
+                room_id__in=room_ids,
+                room__memberships__user=user,
+                created_at__gt=F('room__memberships__last_read_at'),
+                created_at__lte=now,
+                is_deleted=False
+            ).exclude(sender=user).values_list('id', flat=True)
+            MessageReadStatus.objects.bulk_create(
+                [MessageReadStatus(message_id=message_id, user=user) for message_id in unread_ids],
+                ignore_conflicts=True,
+                batch_size=500
+            )
         
-        if read_statuses:
-            MessageReadStatus.objects.bulk_create(read_statuses, ignore_conflicts=True)
+        ChatRoomService.touch_room_lists(user_ids=[user.id])
         
-        return len(read_statuses)
+        return ChatRoomMembership.objects.filter(
+            user=user,
+            room_id__in=room_ids
+        ).update(last_read_at=now, unread_count=0)
+
+    @staticmethod
+    def get_message_reader_ids(message: ChatMessage) -> List[int]:
+        """
+        Get IDs of room members who have read a message.
+        Derived from membership read watermarks instead of per-message rows.
+        
+        Args:
+            message: ChatMessage to check
+            
+        Returns:
+            List of user IDs, excluding the sender
+        """
+        return list(
+            ChatRoomMembership.objects.filter(
+                room_id=message.room_id,
+                last_read_at__gte=message.created_at
+            ).exclude(user_id=message.sender_id).values_list('user_id', flat=True)
+        )
 
     @staticmethod
     def delete_message(message: ChatMessage, user) -> bool:
@@ -464,14 +1028,52 @@ class ChatMessageService:
         # Check permissions
         if message.sender_id != user.id:
             # Check if user is admin
-            if not (hasattr(user, 'role') and user.role == 'admin'):
+            if getattr(user, 'role', None) != 'admin':
                 return False
         
-        message.soft_delete()
+        if message.is_deleted:
+            return True
+        
+        with transaction.atomic():
+            message.soft_delete()
+            ChatMessageService._record_deleted_message(message)
         logger.info(f"Message {message.id} deleted by user {user.id}")
         
         return True
 
+    @staticmethod
+    def delete_message_by_id(room: ChatRoom, message_id, user) -> bool:
+        """
+        Soft delete a message by ID with a single conditional UPDATE.
+        Applies the same permission rule as delete_message without
+        loading the row first.
+        
+        Args:
+            room: ChatRoom the message must belong to
+            message_id: ID of the message to delete
+            user: User requesting deletion
+            
+        Returns:
+            Boolean indicating success
+        """
+        query = ChatMessage.objects.filter(id=message_id, room=room, is_deleted=False)
+        
+        # Non-admins may only delete their own messages
+        if getattr(user, 'role', None) != 'admin':
+            query = query.filter(sender=user)
+        
+        with transaction.atomic():
+            updated = query.update(is_deleted=True, deleted_at=timezone.now())
+            if updated:
+                ChatMessageService._record_deleted_message(
+                    ChatMessage.objects.only('id', 'room_id', 'sender_id', 'created_at').get(id=message_id)
+                )
+        
+        if updated:
+            logger.info(f"Message {message_id} deleted by user {user.id}")
+        
+        return updated > 0
+
     @staticmethod
     def search_messages(
         user,
@@ -491,14 +1093,12 @@ class ChatMessageService:
         Returns:
             List of matching messages
         """
-        # Get rooms user has access to
-        accessible_rooms = ChatRoom.objects.filter(
-            Q(room_type=ChatRoom.RoomType.GLOBAL) |
-            Q(participants=user)
-        ).values_list('id', flat=True)
+        # Limit to rooms the user can see with a semi-join in the same SELECT.
+        # On Postgres the chatmsg_content_trgm index serves the icontains match.
+        is_member = ChatRoomMembership.objects.filter(room_id=OuterRef('room_id'), user=user)
         
         messages_query = ChatMessage.objects.filter(
-            room_id__in=accessible_rooms,
+            Q(room__room_type=ChatRoom.RoomType.GLOBAL) | Exists(is_member),
             is_deleted=False,
             content__icontains=query
         )
@@ -506,9 +1106,9 @@ class ChatMessageService:
         if room_id:
             messages_query = messages_query.filter(room_id=room_id)
         
-        messages = messages_query.order_by('-created_at')[:limit]
+        rows = messages_query.order_by('-created_at').values(*MESSAGE_ROW_FIELDS)[:limit]
         
-        return [msg.to_websocket_dict() for msg in messages]
+        return websocket_dicts_from_rows(rows)
 
 
 class ChatPermissionService:
@@ -535,17 +1135,13 @@ class ChatPermissionService:
             return True
         
         # Admin can delete any message
-        if hasattr(user, 'role') and user.role == 'admin':
+        if getattr(user, 'role', None) == 'admin':
             return True
         
         # Room moderator/admin can delete
-        membership = ChatRoomMembership.objects.filter(
-            room=message.room,
-            user=user,
-            room_role__in=['moderator', 'admin']
-        ).exists()
+        membership = message.room.get_membership(user)
         
-        return membership
+        return membership is not None and membership.room_role in ['moderator', 'admin']
 
     @staticmethod
     def can_manage_room(user, room: ChatRoom) -> bool:
@@ -554,7 +1150,7 @@ class ChatPermissionService:
             return False
         
         # Admin can manage all rooms
-        if hasattr(user, 'role') and user.role == 'admin':
+        if getattr(user, 'role', None) == 'admin':
             return True
         
         # Room creator can manage
@@ -562,8 +1158,6 @@ class ChatPermissionService:
             return True
         
         # Room admin can manage
-        return ChatRoomMembership.objects.filter(
-            room=room,
-            user=user,
-            room_role='admin'
-        ).exists()
+        membership = room.get_membership(user)
+        
+        return membership is not None and membership.room_role == 'admin'
@@ -5,16 +5,33 @@ Handles:
 - Auto-creation of project chat rooms when project is created
 - Auto-adding users to chat room when they join a project
 - Auto-removing users from chat room when they leave a project
+- Invalidating cached room access when chat membership changes
+- Invalidating cached room rows when rooms are saved or deleted
+- Invalidating the cached chat user list when users change
+- Invalidating cached WebSocket users when users change
 """
 import logging
+import threading
 
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 from apps.projects.models import Project, ProjectMembership
+from .middleware import WS_USER_FIELDS, invalidate_token_user
 from .models import ChatRoom, ChatRoomMembership
+from .serializers import CHAT_USER_LIST_CACHE_KEY, CHAT_USER_LIST_FIELDS, GLOBAL_ROOM_CACHE_KEY
+from .services import ChatRoomService
 
 logger = logging.getLogger(__name__)
+User = get_user_model()
+
+# (project_id, user_id) pairs added in the current transaction, per thread
+_pending_chat_members = threading.local()
 
 
 @receiver(post_save, sender=Project)
@@ -56,63 +73,114 @@ def create_project_chat_room(sender, instance, created, **kwargs):
             logger.error(f"Failed to auto-create chat room for project {instance.id}: {str(e)}")
 
 
-@receiver(post_save, sender=ProjectMembership)
+@receiver(post_save, sender=ProjectMembership, dispatch_uid="chat_add_user_to_project_chat")
 def add_user_to_project_chat(sender, instance, created, **kwargs):
     """
     Auto-add user to project chat room when they are added to a project.
     
     Triggered: When a new ProjectMembership is created.
-    Action: Adds the user to the project's ChatRoom.
+    Action: Queues the user and adds every member queued in the transaction
+    to the project's ChatRoom in one batch once it commits.
     """
     if created:
-        try:
-            project = instance.project
-            user = instance.user
-            
-            # Find the chat room for this project
-            room = ChatRoom.objects.filter(
+        pending = getattr(_pending_chat_members, 'items', None)
+        if pending is None:
+            pending = _pending_chat_members.items = []
+        pending.append((instance.project_id, instance.user_id))
+        # Registered per save: the first callback to run flushes the batch and
+        # the rest find it empty; this also survives a rolled-back transaction
+        transaction.on_commit(_flush_project_chat_members)
+
+
+def _flush_project_chat_members():
+    """Add all queued project members to their project chat rooms."""
+    pending = getattr(_pending_chat_members, 'items', None)
+    if not pending:
+        return
+    _pending_chat_members.items = []
+    
+    try:
+        queued = set(pending)
+        project_ids = {project_id for project_id, _ in queued}
+        user_ids = {user_id for _, user_id in queued}
+        
+        # Re-read roles from the database; rows from a rolled-back
+        # transaction are simply not found
+        roles = {
+            (row['project_id'], row['user_id']): row['role']
+            for row in ProjectMembership.objects.filter(
+                project_id__in=project_ids,
+                user_id__in=user_ids
+            ).values('project_id', 'user_id', 'role')
+            if (row['project_id'], row['user_id']) in queued
+        }
+        if not roles:
+            return
+        
+        rooms = {}
+        for room in ChatRoom.objects.filter(
+            room_type=ChatRoom.RoomType.PROJECT,
+            project_id__in=project_ids
+        ):
+            rooms.setdefault(room.project_id, room)
+        
+        for project in Project.objects.filter(
+            id__in={project_id for project_id, _ in roles} - set(rooms)
+        ):
+            logger.warning(f"No chat room found for project {project.id}, creating one now")
+            # Create room if it doesn't exist (edge case)
+            creator_id = project.created_by_id or next(
+                user_id for project_id, user_id in roles if project_id == project.id
+            )
+            rooms[project.id] = ChatRoom.objects.create(
+                name=f"{project.name}",
                 room_type=ChatRoom.RoomType.PROJECT,
-                project=project
-            ).first()
-            
-            if not room:
-                logger.warning(f"No chat room found for project {project.id}, creating one now")
-                # Create room if it doesn't exist (edge case)
-                creator = project.created_by or user
-                room = ChatRoom.objects.create(
-                    name=f"{project.name}",
-                    room_type=ChatRoom.RoomType.PROJECT,
-                    project=project,
-                    created_by=creator,
-                    slug=f"project-{project.id}",
-                )
-            
-            # Check if user is already in the room
-            if ChatRoomMembership.objects.filter(room=room, user=user).exists():
-                logger.debug(f"User {user.id} already in chat room for project {project.id}")
-                return
-            
-            # Map project role to chat room role
-            chat_role = ChatRoomMembership.RoomRole.MEMBER
-            if instance.role in ['owner', 'admin']:
-                chat_role = ChatRoomMembership.RoomRole.ADMIN
-            elif instance.role == 'manager':
-                chat_role = ChatRoomMembership.RoomRole.MODERATOR
-            
-            # Add user to chat room
-            ChatRoomMembership.objects.create(
-                room=room,
-                user=user,
-                room_role=chat_role
+                project=project,
+                created_by_id=creator_id,
+                slug=f"project-{project.id}",
             )
-            
-            logger.info(f"Added user {user.id} to chat room for project {project.id}")
-            
-        except Exception as e:
-            logger.error(f"Failed to add user to project chat: {str(e)}")
+        
+        existing = set(
+            ChatRoomMembership.objects.filter(
+                room_id__in=[room.id for room in rooms.values()],
+                user_id__in=user_ids
+            ).values_list('room_id', 'user_id')
+        )
+        
+        new_memberships = []
+        for (project_id, user_id), role in roles.items():
+            room = rooms.get(project_id)
+            if room is None or (room.id, user_id) in existing:
+                continue
+            new_memberships.append(ChatRoomMembership(
+                room=room,
+                user_id=user_id,
+                room_role=_chat_role_for(role)
+            ))
+        
+        ChatRoomMembership.objects.bulk_create(new_memberships, ignore_conflicts=True)
+        
+        # bulk_create skips post_save, so run the membership invalidation here
+        for membership in new_memberships:
+            _membership_changed(membership.room_id, membership.user_id)
+        
+        if new_memberships:
+            logger.info(f"Added {len(new_memberships)} users to project chat rooms")
+        
+    except Exception as e:
+        logger.error(f"Failed to add users to project chat: {str(e)}")
+
 
+def _chat_role_for(project_role):
+    """Map a project role to the equivalent chat room role."""
+    if project_role in ['owner', 'admin']:
+        return ChatRoomMembership.RoomRole.ADMIN
+    if project_role == 'manager':
+        return ChatRoomMembership.RoomRole.MODERATOR
+    return ChatRoomMembership.RoomRole.MEMBER
 
-@receiver(post_delete, sender=ProjectMembership)
+
+@receiver(post_delete, sender=ProjectMembership, dispatch_uid="chat_remove_user_from_project_chat")
 def remove_user_from_project_chat(sender, instance, **kwargs):
     """
     Auto-remove user from project chat room when they are removed from a project.
@@ -121,74 +189,152 @@ def remove_user_from_project_chat(sender, instance, **kwargs):
     Action: Removes the user from the project's ChatRoom.
     """
     try:
-        project = instance.project
-        user = instance.user
-        
-        # Find the chat room for this project
-        room = ChatRoom.objects.filter(
-            room_type=ChatRoom.RoomType.PROJECT,
-            project=project
-        ).first()
-        
-        if not room:
-            return
-        
-        # Remove user from chat room
+        # Delete through the room join; no separate room lookup
         deleted_count, _ = ChatRoomMembership.objects.filter(
-            room=room,
-            user=user
+            room__project_id=instance.project_id,
+            room__room_type=ChatRoom.RoomType.PROJECT,
+            user_id=instance.user_id
         ).delete()
         
         if deleted_count:
-            logger.info(f"Removed user {user.id} from chat room for project {project.id}")
+            logger.info(f"Removed user {instance.user_id} from chat room for project {instance.project_id}")
             
     except Exception as e:
         logger.error(f"Failed to remove user from project chat: {str(e)}")
 
 
-@receiver(post_save, sender=ProjectMembership)
-def update_user_chat_role(sender, instance, created, **kwargs):
+@receiver(post_save, sender=ProjectMembership, dispatch_uid="chat_update_user_chat_role")
+def update_user_chat_role(sender, instance, created, update_fields=None, **kwargs):
     """
     Update user's chat room role when their project role changes.
     
     Triggered: When a ProjectMembership is updated (not created).
     Action: Updates the user's role in the project's ChatRoom.
     """
+    if update_fields is not None and 'role' not in update_fields:
+        return  # Saved without touching the role
+    
     if not created:  # Only on updates, not creation
         try:
-            project = instance.project
-            user = instance.user
+            new_chat_role = _chat_role_for(instance.role)
             
-            # Find the chat room for this project
-            room = ChatRoom.objects.filter(
-                room_type=ChatRoom.RoomType.PROJECT,
-                project=project
-            ).first()
-            
-            if not room:
-                return
+            # One conditional UPDATE; matches nothing when the role is current
+            updated = ChatRoomMembership.objects.filter(
+                room__project_id=instance.project_id,
+                room__room_type=ChatRoom.RoomType.PROJECT,
+                user_id=instance.user_id
+            ).exclude(room_role=new_chat_role).update(room_role=new_chat_role)
             
-            # Find user's chat membership
-            chat_membership = ChatRoomMembership.objects.filter(
-                room=room,
-                user=user
-            ).first()
-            
-            if not chat_membership:
-                return
-            
-            # Map project role to chat room role
-            new_chat_role = ChatRoomMembership.RoomRole.MEMBER
-            if instance.role in ['owner', 'admin']:
-                new_chat_role = ChatRoomMembership.RoomRole.ADMIN
-            elif instance.role == 'manager':
-                new_chat_role = ChatRoomMembership.RoomRole.MODERATOR
-            
-            # Update if role changed
-            if chat_membership.room_role != new_chat_role:
-                chat_membership.room_role = new_chat_role
-                chat_membership.save(update_fields=['room_role'])
-                logger.info(f"Updated chat role for user {user.id} in project {project.id}")
+            if updated:
+                logger.info(f"Updated chat role for user {instance.user_id} in project {instance.project_id}")
                 
         except Exception as e:
-            logger.error(f"Failed to update user chat role: {str(e)}")
\ No newline at end of file
+            logger.error(f"Failed to update user chat role: {str(e)}")
+
+
+@receiver(post_save, sender=ChatRoomMembership)
+@receiver(post_delete, sender=ChatRoomMembership)
+def invalidate_room_access_cache(sender, instance, **kwargs):
+    """
+    Drop cached access for a membership that changed.
+    
+    Triggered: When a ChatRoomMembership is created or deleted.
+    Action: Forces the next WebSocket connect to re-check access, and tells
+    connected consumers to reload their participant sets once the change
+    commits.
+    """
+    if kwargs.get('created') is False:
+        return  # Read marker or role update; participants are unchanged
+    
+    _membership_changed(instance.room_id, instance.user_id)
+
+
+def _membership_changed(room_id, user_id):
+    """Invalidate cached access for a membership and broadcast after commit."""
+    ChatRoomService.invalidate_room_access(room_id, user_id)
+    ChatRoomService.touch_room_lists(room_ids=[room_id], user_ids=[user_id])
+    
+    def after_commit():
+        cache.delete(GLOBAL_ROOM_CACHE_KEY)  # Cheaper than looking up the room type
+        _broadcast_participants_changed(room_id, user_id)
+    transaction.on_commit(after_commit)
+
+
+def _broadcast_participants_changed(room_id, user_id):
+    """Notify consumers in a room that its participants changed."""
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            ChatRoom.group_name_for(room_id),
+            {'type': 'participants_changed', 'user_id': user_id}
+        )
+    except Exception as e:
+        logger.warning(f"Failed to broadcast participant change for room {room_id}: {str(e)}")
+
+
+@receiver(post_save, sender=ChatRoom)
+def touch_cached_room_lists(sender, instance, created, **kwargs):
+    """
+    Mark cached room data stale when a room is saved.
+    
+    Triggered: When a ChatRoom is created, renamed, deactivated or otherwise saved.
+    Action: Room lists built before the change are rebuilt on next read,
+    the cached room row is dropped, and the cached global room detail is
+    dropped for the global room.
+    """
+    if not created:
+        ChatRoomService.invalidate_room(instance.id)
+    
+    if instance.room_type == ChatRoom.RoomType.GLOBAL:
+        # Global rooms reach every list without a membership, so a new or
+        # reactivated one isn't among any cached list's rooms
+        ChatRoomService.touch_room_lists(all_lists=True)
+        transaction.on_commit(lambda: cache.delete(GLOBAL_ROOM_CACHE_KEY))
+    elif not created:  # New member rooms reach lists through membership changes
+        ChatRoomService.touch_room_lists(room_ids=[instance.id])
+
+
+@receiver(post_delete, sender=ChatRoom)
+def invalidate_cached_room(sender, instance, **kwargs):
+    """
+    Drop the cached row of a deleted room.
+    
+    Triggered: When a ChatRoom is deleted.
+    Action: Room-scoped views return 404 instead of a cached room.
+    """
+    ChatRoomService.invalidate_room(instance.id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_chat_user_list(sender, instance, **kwargs):
+    """
+    Drop the cached chat user list when a user changes.
+    
+    Triggered: When a User is created, saved or deleted.
+    Action: The next UserListView request rebuilds the list. Saves limited
+    to fields the list doesn't show (e.g. last_login on every login) are
+    ignored.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not set(update_fields) & {'is_active', *CHAT_USER_LIST_FIELDS}:
+        return
+    
+    transaction.on_commit(lambda: cache.delete(CHAT_USER_LIST_CACHE_KEY))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_ws_user(sender, instance, **kwargs):
+    """
+    Drop the cached WebSocket user when a user changes.
+    
+    Triggered: When a User is saved or deleted.
+    Action: The next handshake reloads the user, so deactivated, deleted or
+    demoted users lose access immediately. Saves limited to fields the
+    cached user doesn't carry (e.g. last_login) are ignored.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not set(update_fields) & set(WS_USER_FIELDS):
+        return
+    
+    invalidate_token_user(instance.id)
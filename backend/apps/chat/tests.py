@@ -4,21 +4,33 @@ Tests for chat application.
 Run with: python manage.py test apps.chat
 """
 import json
+import jwt
+import time
+from unittest import mock
+from datetime import timedelta
 from uuid import uuid4
 
-from django.test import TestCase, TransactionTestCase
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
 from rest_framework import status
-from channels.testing import WebsocketCommunicator
-from channels.routing import URLRouter
-from channels.db import database_sync_to_async
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from asgiref.sync import async_to_sync
 
-from .models import ChatRoom, ChatMessage, ChatRoomMembership
-from .services import ChatRoomService, ChatMessageService
-from .consumers import ChatConsumer
-from .routing import websocket_urlpatterns
+from .models import ChatRoom, ChatMessage, ChatRoomMembership, MessageReadStatus
+from .services import ChatRoomService, ChatMessageService, ChatPermissionService
+from .serializers import ChatMessageSerializer, MESSAGE_ROW_FIELDS, serialize_message_rows
+from .middleware import (
+    JWTAuthMiddleware, bearer_token, decode_access_token, get_token_user, query_param,
+)
+from .checks import check_shared_cache
+from .consumers import ChatConsumer, MessageOutbox, _presence_frame, _read_receipt_frame, _typing_frame
+from core.channel_layers import GroupKeyCachingRedisChannelLayer
+from core.renderers import ORJSONRenderer
 
 User = get_user_model()
 
@@ -26,9 +38,10 @@ User = get_user_model()
 class ChatRoomModelTest(TestCase):
     """Tests for ChatRoom model."""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Set up test data."""
-        self.user = User.objects.create_user(
+        cls.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
             password='testpass123'
@@ -76,23 +89,25 @@ class ChatRoomModelTest(TestCase):
             slug='test-room'
         )
         
-        self.assertEqual(room.channel_group_name, 'chat_test-room')
+        self.assertEqual(room.channel_group_name, f'chat_{room.id}')
+        self.assertEqual(ChatRoom.group_name_for(room.id), room.channel_group_name)
 
 
 class ChatMessageModelTest(TestCase):
     """Tests for ChatMessage model."""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Set up test data."""
-        self.user = User.objects.create_user(
+        cls.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
             password='testpass123'
         )
-        self.room = ChatRoom.objects.create(
+        cls.room = ChatRoom.objects.create(
             name='Test Room',
             room_type=ChatRoom.RoomType.GLOBAL,
-            created_by=self.user
+            created_by=cls.user
         )
 
     def test_create_message(self):
@@ -134,23 +149,118 @@ class ChatMessageModelTest(TestCase):
         self.assertEqual(data['sender']['username'], 'testuser')
         self.assertEqual(str(data['room_id']), str(self.room.id))
 
+    def test_message_ids_are_time_ordered(self):
+        """Test message primary keys are version 7 UUIDs that sort by creation."""
+        first = ChatMessage.objects.create(room=self.room, sender=self.user, content='1')
+        time.sleep(0.002)
+        second = ChatMessage.objects.create(room=self.room, sender=self.user, content='2')
+        
+        self.assertEqual(first.id.version, 7)
+        self.assertLess(first.id, second.id)
+
+    def test_websocket_dict_uses_stored_full_name(self):
+        """Test the sender's stored full name follows name changes."""
+        message = ChatMessage.objects.create(room=self.room, sender=self.user, content='Hi')
+        self.assertEqual(message.to_websocket_dict()['sender']['full_name'], 'testuser')
+        
+        self.user.first_name = 'Test'
+        self.user.last_name = 'User'
+        self.user.save(update_fields=['first_name', 'last_name'])
+        
+        message = ChatMessage.objects.select_related('sender').get(id=message.id)
+        self.assertEqual(message.to_websocket_dict()['sender']['full_name'], 'Test User')
+
 
 class ChatRoomServiceTest(TestCase):
     """Tests for ChatRoomService."""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Set up test data."""
-        self.user1 = User.objects.create_user(
+        cls.user1 = User.objects.create_user(
             username='user1',
             email='user1@example.com',
             password='testpass123'
         )
-        self.user2 = User.objects.create_user(
+        cls.user2 = User.objects.create_user(
             username='user2',
             email='user2@example.com',
             password='testpass123'
         )
 
+    def test_create_project_room_adds_members(self):
+        """Test project members and the creator join a new project room."""
+        from apps.projects.models import Project, ProjectMembership
+        project = Project.objects.create(name='Apollo', created_by=self.user1)
+        ProjectMembership.objects.create(project=project, user=self.user2)
+        ChatRoom.objects.filter(project=project).delete()
+        
+        room = ChatRoomService.create_project_room(project, self.user1)
+        
+        self.assertEqual(
+            set(room.memberships.values_list('user_id', flat=True)),
+            {self.user1.id, self.user2.id}
+        )
+
+    def test_project_members_join_chat_on_commit(self):
+        """Test members added in one transaction join the chat room in one batch."""
+        from apps.projects.models import Project, ProjectMembership
+        user3 = User.objects.create_user(
+            username='user3',
+            email='user3@example.com',
+            password='testpass123'
+        )
+        project = Project.objects.create(name='Apollo', created_by=self.user1)
+        room = ChatRoom.objects.get(project=project)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                ProjectMembership.objects.create(project=project, user=self.user2, role='manager')
+                ProjectMembership.objects.create(project=project, user=user3)
+                self.assertEqual(room.memberships.count(), 1)
+        
+        self.assertEqual(
+            dict(room.memberships.values_list('user_id', 'room_role')),
+            {
+                self.user1.id: ChatRoomMembership.RoomRole.ADMIN,
+                self.user2.id: ChatRoomMembership.RoomRole.MODERATOR,
+                user3.id: ChatRoomMembership.RoomRole.MEMBER,
+            }
+        )
+
+    def test_project_role_change_updates_chat_role(self):
+        """Test role saves sync the chat role and other saves skip the signal."""
+        from apps.projects.models import Project, ProjectMembership
+        project = Project.objects.create(name='Apollo', created_by=self.user1)
+        room = ChatRoom.objects.get(project=project)
+        membership = ProjectMembership.objects.create(project=project, user=self.user2)
+        ChatRoomService.add_participant(room, self.user2)
+        
+        with self.assertNumQueries(1):
+            membership.save(update_fields=['joined_at'])
+        
+        membership.role = 'admin'
+        with self.assertNumQueries(2):
+            membership.save(update_fields=['role'])
+        
+        self.assertEqual(
+            room.memberships.get(user=self.user2).room_role,
+            ChatRoomMembership.RoomRole.ADMIN
+        )
+
+    def test_leaving_project_leaves_chat(self):
+        """Test deleting a project membership removes the chat membership."""
+        from apps.projects.models import Project, ProjectMembership
+        project = Project.objects.create(name='Apollo', created_by=self.user1)
+        room = ChatRoom.objects.get(project=project)
+        membership = ProjectMembership.objects.create(project=project, user=self.user2)
+        ChatRoomService.add_participant(room, self.user2)
+        
+        membership.delete()
+        
+        self.assertFalse(room.memberships.filter(user=self.user2).exists())
+        self.assertTrue(room.memberships.filter(user=self.user1).exists())
+
     def test_create_global_room(self):
         """Test creating global room."""
         room = ChatRoomService.create_global_room('Global', self.user1)
@@ -177,6 +287,16 @@ class ChatRoomServiceTest(TestCase):
         self.assertFalse(created2)
         self.assertEqual(room.id, room2.id)
 
+    def test_get_existing_private_room_single_query(self):
+        """Test finding an existing private room takes one query."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user1, self.user2)
+        
+        with self.assertNumQueries(1):
+            found, created = ChatRoomService.get_or_create_private_room(self.user2, self.user1)
+        
+        self.assertFalse(created)
+        self.assertEqual(found.id, room.id)
+
     def test_check_room_access_global(self):
         """Test global room access."""
         room = ChatRoomService.create_global_room('Global', self.user1)
@@ -200,18 +320,98 @@ class ChatRoomServiceTest(TestCase):
         self.assertTrue(ChatRoomService.check_room_access(room, self.user2))
         self.assertFalse(ChatRoomService.check_room_access(room, user3))
 
+    def test_permission_checks_share_membership_lookup(self):
+        """Test access and role checks on one room object query membership once."""
+        room, _ = ChatRoomService.get_or_create_private_room(
+            self.user1, self.user2
+        )
+        room = ChatRoom.objects.get(id=room.id)
+        
+        with self.assertNumQueries(1):
+            self.assertTrue(ChatRoomService.check_room_access(room, self.user2))
+            self.assertTrue(ChatPermissionService.can_send_message(self.user2, room))
+            self.assertFalse(ChatPermissionService.can_manage_room(self.user2, room))
+        
+        ChatRoomService.remove_participant(room, self.user2)
+        self.assertFalse(ChatRoomService.check_room_access(room, self.user2))
+
+    def test_room_access_cache_invalidated_on_leave(self):
+        """Test leaving a room drops the cached access grant."""
+        room, _ = ChatRoomService.get_or_create_private_room(
+            self.user1, self.user2
+        )
+        ChatRoomService.cache_room_access(room.id, self.user2.id)
+        self.assertTrue(ChatRoomService.get_cached_room_access(room.id, self.user2.id))
+        
+        ChatRoomService.remove_participant(room, self.user2)
+        
+        self.assertFalse(ChatRoomService.get_cached_room_access(room.id, self.user2.id))
+
+    def test_check_room_access_reuses_grant(self):
+        """Test a granted room check is answered without a query next time."""
+        room, _ = ChatRoomService.get_or_create_private_room(
+            self.user1, self.user2
+        )
+        self.assertTrue(ChatRoomService.check_room_access(room, self.user2))
+        room = ChatRoom.objects.get(id=room.id)  # Fresh instance, no memoized membership
+        
+        with self.assertNumQueries(0):
+            self.assertTrue(ChatRoomService.check_room_access(room, self.user2))
+        
+        ChatRoomService.remove_participant(room, self.user2)
+        self.assertFalse(ChatRoomService.check_room_access(room, self.user2))
+
+    def test_get_active_room_cached_until_saved(self):
+        """Test active rooms are served from the cache until the room changes."""
+        room, _ = ChatRoomService.get_or_create_private_room(
+            self.user1, self.user2
+        )
+        self.assertEqual(ChatRoomService.get_active_room(room.id), room)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(ChatRoomService.get_active_room(room.id), room)
+
+        room.is_active = False
+        room.save(update_fields=['is_active'])
+        self.assertIsNone(ChatRoomService.get_active_room(room.id))
+
+    def test_get_accessible_room(self):
+        """Test a room and the user's access load together in one query."""
+        room, _ = ChatRoomService.get_or_create_private_room(
+            self.user1, self.user2
+        )
+        user3 = User.objects.create_user(
+            username='user3',
+            email='user3@example.com',
+            password='testpass123'
+        )
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(ChatRoomService.get_accessible_room(self.user2, room.id), (room, True))
+        self.assertEqual(ChatRoomService.get_accessible_room(user3, room.id), (room, False))
+        self.assertEqual(ChatRoomService.get_accessible_room(user3, uuid4()), (None, False))
+
 
 class ChatMessageServiceTest(TestCase):
     """Tests for ChatMessageService."""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Set up test data."""
-        self.user = User.objects.create_user(
+        cls.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
             password='testpass123'
         )
-        self.room = ChatRoomService.create_global_room('Global', self.user)
+        cls.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        cls.room = ChatRoomService.create_global_room('Global', cls.user)
+
+    def setUp(self):
+        cache.clear()
 
     def test_create_message(self):
         """Test creating a message."""
@@ -227,13 +427,11 @@ class ChatMessageServiceTest(TestCase):
 
     def test_get_room_messages(self):
         """Test fetching room messages."""
-        # Create some messages
-        for i in range(5):
-            ChatMessageService.create_message(
-                room=self.room,
-                sender=self.user,
-                content=f'Message {i}'
-            )
+        # Only the read path is under test; skip create_message's side effects
+        ChatMessage.objects.bulk_create([
+            ChatMessage(room=self.room, sender=self.user, content=f'Message {i}')
+            for i in range(5)
+        ])
         
         messages = ChatMessageService.get_room_messages(
             room=self.room,
@@ -243,6 +441,32 @@ class ChatMessageServiceTest(TestCase):
         
         self.assertEqual(len(messages), 5)
 
+    def test_room_message_rows_match_websocket_dict(self):
+        """Test values()-based room messages match ChatMessage.to_websocket_dict."""
+        original = ChatMessageService.create_message(
+            room=self.room,
+            sender=self.user,
+            content='Original'
+        )
+        ChatMessageService.create_message(
+            room=self.room,
+            sender=self.user,
+            content='Reply',
+            reply_to_id=original.id
+        )
+        ChatMessage.objects.create(room=self.room, sender=None, content='System notice')
+        ChatMessage.objects.filter(id=original.id).update(attachment='chat_attachments/a.txt')
+        
+        expected = [
+            msg.to_websocket_dict()
+            for msg in ChatMessage.objects.filter(room=self.room).order_by('created_at', 'id')
+        ]
+        
+        self.assertEqual(
+            ChatMessageService.get_room_messages(room=self.room, user=self.user),
+            expected
+        )
+
     def test_search_messages(self):
         """Test message search."""
         ChatMessageService.create_message(
@@ -268,22 +492,274 @@ class ChatMessageServiceTest(TestCase):
         
         self.assertEqual(len(results), 2)
 
+    def test_search_messages_private_rooms(self):
+        """Test search only includes private rooms the user belongs to."""
+        alice, bob = [
+            User.objects.create_user(
+                username=name,
+                email=f'{name}@example.com',
+                password='testpass123'
+            )
+            for name in ('alice', 'bob')
+        ]
+        mine, _ = ChatRoomService.get_or_create_private_room(self.user, alice)
+        theirs, _ = ChatRoomService.get_or_create_private_room(alice, bob)
+        ChatMessageService.create_message(room=mine, sender=alice, content='secret for you')
+        ChatMessageService.create_message(room=theirs, sender=alice, content='secret for bob')
+        
+        results = ChatMessageService.search_messages(user=self.user, query='secret')
+        
+        self.assertEqual([r['content'] for r in results], ['secret for you'])
+
+    def test_delete_message_by_id(self):
+        """Test only the sender can soft delete their message."""
+        message = ChatMessageService.create_message(
+            room=self.room,
+            sender=self.user,
+            content='Delete me'
+        )
+        
+        self.assertFalse(ChatMessageService.delete_message_by_id(self.room, message.id, self.other_user))
+        self.assertTrue(ChatMessageService.delete_message_by_id(self.room, message.id, self.user))
+        
+        message.refresh_from_db()
+        self.assertTrue(message.is_deleted)
+        self.assertIsNotNone(message.deleted_at)
+
+    def test_private_message_notifies_other_participant(self):
+        """Test a private message creates one notification for the recipient."""
+        from apps.notification.models import Notification
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        message = ChatMessageService.create_message(room=room, sender=self.user, content='Hi')
+        ChatMessageService.create_message(room=self.room, sender=self.user, content='Hi all')
+        
+        notification = Notification.objects.get()
+        self.assertEqual(notification.recipient, self.other_user)
+        self.assertEqual(notification.actor, self.user)
+        self.assertEqual(notification.notification_type, Notification.NotificationType.CHAT_MESSAGE)
+        self.assertEqual(notification.object_id, str(message.id))
+
+    def test_message_notifications_respect_preferences(self):
+        """Test recipients who turned chat notifications off are skipped."""
+        from apps.notification.models import Notification, NotificationPreference
+        preferences = NotificationPreference.objects.create(
+            user=self.other_user, system_notifications=False
+        )
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        
+        ChatMessageService.create_message(room=room, sender=self.user, content='Hi')
+        self.assertEqual(Notification.objects.count(), 1)
+        
+        preferences.chat_notifications = False
+        preferences.save()
+        ChatMessageService.create_message(room=room, sender=self.user, content='Hi again')
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_denormalized_room_metadata(self):
+        """Test last message and unread counters follow writes, reads and deletes."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        ChatRoomMembership.objects.filter(room=room).update(last_read_at=timezone.now())
+        first = ChatMessageService.create_message(room=room, sender=self.other_user, content='First')
+        ChatMessageService.bulk_create_messages([
+            ChatMessage(room=room, sender=self.other_user, content='Second'),
+            ChatMessage(room=room, sender=self.user, content='Third'),
+        ])
+        second = ChatMessage.objects.get(content='Second')
+        third = ChatMessage.objects.get(content='Third')
+
+        room.refresh_from_db()
+        self.assertEqual(room.last_message_id, third.id)
+        self.assertEqual(room.last_message_preview, 'Third')
+        self.assertEqual(room.last_message_sender_username, 'testuser')
+        mine = ChatRoomMembership.objects.get(room=room, user=self.user)
+        theirs = ChatRoomMembership.objects.get(room=room, user=self.other_user)
+        self.assertEqual(mine.unread_count, 2)
+        self.assertEqual(theirs.unread_count, 1)
+
+        self.assertTrue(ChatMessageService.delete_message_by_id(room, third.id, self.user))
+        self.assertTrue(ChatMessageService.delete_message(first, self.other_user))
+        room.refresh_from_db()
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual(room.last_message_id, second.id)
+        self.assertEqual(room.last_message_preview, 'Second')
+        self.assertEqual(mine.unread_count, 1)
+        self.assertEqual(theirs.unread_count, 0)
+
+        ChatMessageService.mark_messages_as_read(room, self.user)
+        mine.refresh_from_db()
+        self.assertEqual(mine.unread_count, 0)
+
+    def test_get_user_rooms(self):
+        """Test user rooms are listed with two queries, newest activity first."""
+        rooms = []
+        for i in range(3):
+            other_user = User.objects.create_user(
+                username=f'other{i}',
+                email=f'other{i}@example.com',
+                password='testpass123'
+            )
+            room, _ = ChatRoomService.get_or_create_private_room(self.user, other_user)
+            ChatMessageService.create_message(room=room, sender=other_user, content=f'Hi {i}')
+            rooms.append(room)
+        
+        with self.assertNumQueries(2):
+            result = ChatRoomService.get_user_rooms(self.user)
+        
+        self.assertEqual(
+            [r['id'] for r in result[:3]],
+            [str(room.id) for room in reversed(rooms)]
+        )
+        self.assertEqual(result[0]['last_message']['content'], 'Hi 2')
+        self.assertEqual(result[0]['unread_count'], 1)
+        self.assertIsNone(result[-1]['last_message'])  # global room, no messages
+
+    def test_get_user_rooms_cached_until_touched(self):
+        """Test cached room lists are reused and rebuilt after relevant writes."""
+        with self.captureOnCommitCallbacks(execute=True):
+            room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        
+        # Build the entry well after the membership stamp (beyond clock skew)
+        now = time.time()
+        with mock.patch('apps.chat.services.time.time', return_value=now + 5):
+            ChatRoomService.get_user_rooms(self.user)
+        
+        with self.assertNumQueries(0):
+            ChatRoomService.get_user_rooms(self.user)
+        
+        # A later stamp on one of its rooms forces a rebuild
+        with mock.patch('apps.chat.services.time.time', return_value=now + 10):
+            with self.captureOnCommitCallbacks(execute=True):
+                ChatMessageService.create_message(room=room, sender=self.other_user, content='Hi')
+        
+        rooms = ChatRoomService.get_user_rooms(self.user)
+        self.assertEqual(rooms[0]['last_message']['content'], 'Hi')
+        self.assertEqual(rooms[0]['unread_count'], 1)
+
+    def test_new_global_room_reaches_cached_room_lists(self):
+        """Test creating a global room marks every cached room list stale."""
+        now = time.time()
+        with mock.patch('apps.chat.services.time.time', return_value=now + 5):
+            ChatRoomService.get_user_rooms(self.user)
+
+        with mock.patch('apps.chat.services.time.time', return_value=now + 10):
+            with self.captureOnCommitCallbacks(execute=True):
+                lobby = ChatRoom.objects.create(
+                    name='Lobby',
+                    room_type=ChatRoom.RoomType.GLOBAL,
+                    created_by=self.user
+                )
+
+        rooms = ChatRoomService.get_user_rooms(self.user)
+        self.assertIn(str(lobby.id), [room['id'] for room in rooms])
+
+    def test_get_room_messages_keyset_pagination(self):
+        """Test before/after anchors page through messages sharing a timestamp."""
+        messages = [
+            ChatMessageService.create_message(room=self.room, sender=self.user, content=f'Msg {i}')
+            for i in range(3)
+        ]
+        ChatMessage.objects.filter(room=self.room).update(created_at=messages[0].created_at)
+        
+        before = ChatMessageService.get_room_messages(self.room, self.user, before=str(messages[2].id))
+        after = ChatMessageService.get_room_messages(self.room, self.user, after=str(messages[0].id))
+        
+        self.assertEqual([m['content'] for m in before], ['Msg 0', 'Msg 1'])
+        self.assertEqual([m['content'] for m in after], ['Msg 1', 'Msg 2'])
+
+    def test_get_room_messages_unknown_anchor(self):
+        """Test purged or other-room anchors leave the page unfiltered."""
+        for i in range(2):
+            ChatMessageService.create_message(room=self.room, sender=self.user, content=f'Msg {i}')
+        other_room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        foreign = ChatMessageService.create_message(room=other_room, sender=self.user, content='Elsewhere')
+        
+        for anchor in (str(uuid4()), str(foreign.id)):
+            for cursor in ('before', 'after'):
+                messages = ChatMessageService.get_room_messages(self.room, self.user, **{cursor: anchor})
+                self.assertEqual([m['content'] for m in messages], ['Msg 0', 'Msg 1'])
+
+    def test_message_listing_query_count(self):
+        """Test listing and searching messages don't query per sender."""
+        for i in range(3):
+            sender = User.objects.create_user(
+                username=f'sender{i}',
+                email=f'sender{i}@example.com',
+                password='testpass123'
+            )
+            ChatMessageService.create_message(room=self.room, sender=sender, content=f'Hello {i}')
+        
+        with self.assertNumQueries(1):
+            ChatMessageService.get_room_messages(self.room, self.user)
+        with self.assertNumQueries(1):
+            ChatMessageService.search_messages(self.user, 'Hello')
+
+    def test_rebuild_room_metadata(self):
+        """Test drifted denormalized columns are recomputed from messages."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        ChatRoomMembership.objects.filter(room=room).update(
+            last_read_at=timezone.now() - timedelta(minutes=1)
+        )
+        message = ChatMessageService.create_message(room=room, sender=self.other_user, content='Hi')
+        ChatRoom.objects.filter(pk=room.pk).update(last_message_id=None, last_message_preview='')
+        ChatRoomMembership.objects.filter(room=room).update(unread_count=7)
+        
+        self.assertEqual(ChatRoomService.rebuild_room_metadata([room.id]), 1)
+        
+        room.refresh_from_db()
+        self.assertEqual(room.last_message_id, message.id)
+        self.assertEqual(room.last_message_preview, 'Hi')
+        self.assertEqual(ChatRoomMembership.objects.get(room=room, user=self.user).unread_count, 1)
+        self.assertEqual(ChatRoomMembership.objects.get(room=room, user=self.other_user).unread_count, 0)
+
+    def test_mark_messages_as_read_watermark(self):
+        """Test read receipts come from the membership watermark, not per-message rows."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        ChatRoomMembership.objects.filter(room=room).update(
+            last_read_at=timezone.now() - timedelta(minutes=1)
+        )
+        message = ChatMessageService.create_message(room=room, sender=self.other_user, content='Hi')
+        ChatMessageService.create_message(room=room, sender=self.other_user, content='There')
+        
+        self.assertEqual(ChatMessageService.get_message_reader_ids(message), [])
+        self.assertEqual(ChatMessageService.mark_messages_as_read(room, self.user), 2)
+        self.assertEqual(ChatMessageService.get_message_reader_ids(message), [self.user.id])
+        self.assertFalse(MessageReadStatus.objects.exists())
+        
+        with self.settings(CHAT_MESSAGE_READ_ROWS=True):
+            ChatMessageService.create_message(room=room, sender=self.other_user, content='Again')
+            self.assertEqual(ChatMessageService.mark_messages_as_read(room, self.user), 1)
+        self.assertEqual(MessageReadStatus.objects.filter(user=self.user).count(), 1)
+        
+        # Already read: one SELECT, no UPDATE
+        with self.assertNumQueries(1):
+            self.assertEqual(ChatMessageService.mark_messages_as_read(room, self.user), 0)
+
 
 class ChatRoomAPITest(APITestCase):
     """Tests for Chat REST API."""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Set up test data."""
-        self.user = User.objects.create_user(
+        cls.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
             password='testpass123'
         )
-        self.client = APIClient()
-        self.client.force_authenticate(user=self.user)
         
+        cls.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
         # Create global room
-        self.global_room = ChatRoomService.create_global_room('Global', self.user)
+        cls.global_room = ChatRoomService.create_global_room('Global', cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
 
     def test_list_rooms(self):
         """Test listing chat rooms."""
@@ -293,6 +769,138 @@ class ChatRoomAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreaterEqual(len(response.data), 1)
 
+    def test_list_rooms_query_count(self):
+        """Test the room list query count does not grow with the room count."""
+        for i in range(5):
+            other_user = User.objects.create_user(
+                username=f'other{i}',
+                email=f'other{i}@example.com',
+                password='testpass123'
+            )
+            room, _ = ChatRoomService.get_or_create_private_room(self.user, other_user)
+            ChatMessageService.create_message(room=room, sender=other_user, content='Hi')
+        url = reverse('chat-room-list')
+        self.client.get(url)  # Warm the active user count
+        cache.delete(ChatRoomService.room_list_api_cache_key(self.user.id))
+        
+        with self.assertNumQueries(2):  # rooms, then the caller's memberships
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 6)
+
+    def test_list_rooms_cached_until_room_changes(self):
+        """Test the room list response is cached until one of its rooms changes."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        url = reverse('chat-room-list')
+        self.client.get(url, {'type': 'private'})
+        
+        with self.assertNumQueries(0):
+            self.client.get(url, {'type': 'private'})
+        
+        with mock.patch('apps.chat.services.time.time', return_value=time.time() + 5):
+            with self.captureOnCommitCallbacks(execute=True):
+                ChatMessageService.create_message(room=room, sender=self.other_user, content='New')
+        
+        with mock.patch('apps.chat.views.time.time', return_value=time.time() + 10):
+            response = self.client.get(url, {'type': 'private'})
+        self.assertEqual(response.data[0]['last_message']['content_preview'], 'New')
+
+    def test_list_users_cached(self):
+        """Test the chat user list is shared from cache and refreshed on user changes."""
+        url = reverse('user-list')
+        self.client.get(url)
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual([user['username'] for user in response.data], ['otheruser'])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_user.is_active = False
+            self.other_user.save()
+        
+        self.assertEqual(self.client.get(url).data, [])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(
+                username='newuser',
+                email='new@example.com',
+                password='testpass123'
+            )
+        
+        self.assertEqual([user['username'] for user in self.client.get(url).data], ['newuser'])
+
+    def test_global_participant_count_cached(self):
+        """Test the global room's active-user count is cached between lists."""
+        cache.clear()
+        url = reverse('chat-room-list')
+        self.client.get(url, {'type': 'global'})
+        User.objects.create_user(
+            username='newuser',
+            email='new@example.com',
+            password='testpass123'
+        )
+        
+        response = self.client.get(url, {'type': 'global'})
+        
+        self.assertEqual(response.data[0]['participant_count'], 2)
+
+    def test_list_rooms_metadata(self):
+        """Test room list reports last message, unread count and membership."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        ChatRoomMembership.objects.filter(room=room).update(last_read_at=timezone.now())
+        ChatMessageService.create_message(room=room, sender=self.other_user, content='First')
+        ChatMessageService.create_message(room=room, sender=self.other_user, content='Second')
+        
+        response = self.client.get(reverse('chat-room-list'), {'type': 'private'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data[0]
+        self.assertEqual(data['participant_count'], 2)
+        self.assertEqual(data['unread_count'], 2)
+        self.assertTrue(data['is_member'])
+        self.assertEqual(data['last_message']['content_preview'], 'Second')
+        self.assertEqual(data['last_message']['sender_username'], 'otheruser')
+
+    def test_mark_rooms_read(self):
+        """Test several rooms are marked read in one request."""
+        rooms = []
+        for i in range(2):
+            other_user = User.objects.create_user(
+                username=f'other{i}',
+                email=f'other{i}@example.com',
+                password='testpass123'
+            )
+            room, _ = ChatRoomService.get_or_create_private_room(self.user, other_user)
+            ChatRoomMembership.objects.filter(room=room).update(
+                last_read_at=timezone.now() - timedelta(minutes=1)
+            )
+            ChatMessageService.create_message(room=room, sender=other_user, content='Hi')
+            rooms.append(room)
+        
+        with self.settings(CHAT_MESSAGE_READ_ROWS=True):
+            response = self.client.post(
+                reverse('chat-rooms-mark-read'),
+                {'room_ids': [str(room.id) for room in rooms]},
+                format='json'
+            )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['marked_rooms'], 2)
+        self.assertFalse(
+            ChatRoomMembership.objects.filter(user=self.user, unread_count__gt=0).exists()
+        )
+        self.assertEqual(MessageReadStatus.objects.filter(user=self.user).count(), 2)
+
+    def test_malformed_json_body(self):
+        """Test a malformed JSON body is rejected as a parse error."""
+        response = self.client.post(
+            reverse('chat-rooms-mark-read'),
+            '{"room_ids": [',
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('JSON parse error', response.data['detail'])
+
     def test_get_room_detail(self):
         """Test getting room details."""
         url = reverse('chat-room-detail', kwargs={'room_id': self.global_room.id})
@@ -301,6 +909,68 @@ class ChatRoomAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['name'], 'Global Chat')
 
+    def test_get_global_room_cached(self):
+        """Test the global room detail is cached and dropped when the room changes."""
+        url = reverse('chat-room-global')
+        ChatRoomService.add_participant(self.global_room, self.user)
+        self.client.get(url)
+        
+        with self.assertNumQueries(1):  # The caller's membership only
+            response = self.client.get(url)
+        self.assertEqual(response.data['current_user_membership']['user']['username'], 'testuser')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.global_room.name = 'Lobby'
+            self.global_room.save()
+        
+        self.assertEqual(self.client.get(url).data['name'], 'Lobby')
+
+    def test_private_room_detail_query_count(self):
+        """Test room detail loads members in constant queries."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        for i in range(3):
+            ChatRoomService.add_participant(room, User.objects.create_user(
+                username=f'member{i}',
+                email=f'member{i}@example.com',
+                password='testpass123'
+            ))
+        url = reverse('chat-room-detail', kwargs={'room_id': room.id})
+        
+        # room with access check, creator, participants, memberships with users
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        
+        self.assertEqual(len(response.data['memberships']), 5)
+        self.assertEqual(response.data['current_user_membership']['user']['username'], 'testuser')
+
+    def test_online_users(self):
+        """Test room participants and their count come from one query."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        url = reverse('chat-room-online-users', kwargs={'room_id': room.id})
+        
+        with self.assertNumQueries(2):  # room with access check, participants
+            response = self.client.get(url)
+        
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['participants']), 2)
+
+    def test_room_settings_mute(self):
+        """Test muting a room is a single UPDATE and non-members get a 404."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        url = reverse('chat-room-settings', kwargs={'room_id': room.id})
+        ChatRoomService.get_active_room(room.id)
+
+        with self.assertNumQueries(1):
+            response = self.client.patch(url, {'is_muted': True}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_muted'])
+        self.assertTrue(ChatRoomMembership.objects.get(room=room, user=self.user).is_muted)
+
+        ChatRoomService.remove_participant(room, self.user)
+        response = self.client.patch(url, {'is_muted': False}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_get_global_room(self):
         """Test getting global chat room."""
         url = reverse('chat-room-global')
@@ -311,17 +981,45 @@ class ChatRoomAPITest(APITestCase):
 
     def test_create_private_room(self):
         """Test creating private chat room."""
+        
+        url = reverse('chat-room-create-private')
+        response = self.client.post(url, {'user_id': self.other_user.id})
+        
+        self.assertIn(response.status_code, [status.HTTP_200_OK, status.HTTP_201_CREATED])
+        self.assertEqual(response.data['room_type'], 'private')
+
+    def test_create_private_room_inactive_user(self):
+        """Test a private room can't be opened with an inactive user."""
         other_user = User.objects.create_user(
-            username='otheruser',
-            email='other@example.com',
-            password='testpass123'
+            username='inactiveuser',
+            email='inactive@example.com',
+            password='testpass123',
+            is_active=False
         )
         
         url = reverse('chat-room-create-private')
         response = self.client.post(url, {'user_id': other_user.id})
         
-        self.assertIn(response.status_code, [status.HTTP_200_OK, status.HTTP_201_CREATED])
-        self.assertEqual(response.data['room_type'], 'private')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('user_id', response.data)
+
+    def test_get_message_detail_with_reply(self):
+        """Test message detail serializes sender and reply without extra queries."""
+        original = ChatMessageService.create_message(
+            room=self.global_room, sender=self.user, content='Original'
+        )
+        reply = ChatMessageService.create_message(
+            room=self.global_room, sender=self.user, content='Reply', reply_to_id=original.id
+        )
+        url = reverse('chat-message-detail', kwargs={
+            'room_id': self.global_room.id, 'message_id': reply.id
+        })
+        
+        with self.assertNumQueries(2):  # room, then message with joins
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reply_to_preview']['sender_username'], 'testuser')
 
     def test_get_room_messages(self):
         """Test getting room messages."""
@@ -338,6 +1036,98 @@ class ChatRoomAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['messages']), 1)
 
+    def test_get_room_messages_invalid_cursor(self):
+        """Test malformed before/after values are rejected with a 400."""
+        url = reverse('chat-room-messages', kwargs={'room_id': self.global_room.id})
+        
+        for cursor in ('before', 'after'):
+            response = self.client.get(url, {cursor: 'not-a-uuid'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_room_messages_query_count(self):
+        """Test the message list query count does not grow with the page size."""
+        url = reverse('chat-room-messages', kwargs={'room_id': self.global_room.id})
+        ChatMessageService.create_message(room=self.global_room, sender=self.user, content='First')
+        
+        with self.assertNumQueries(2):  # room with unread counter, messages with joins
+            self.client.get(url)
+        
+        for i in range(10):
+            ChatMessageService.create_message(
+                room=self.global_room,
+                sender=self.user,
+                content=f'Message {i}'
+            )
+        
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['messages']), 11)
+        
+        # Cursor anchors are resolved inside the message query
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'before': response.data['messages'][5]['id']})
+        self.assertEqual(len(response.data['messages']), 5)
+
+    def test_get_room_messages_marks_read(self):
+        """Test loading a room's messages clears the caller's unread counter."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        ChatMessageService.create_message(room=room, sender=self.other_user, content='Hi')
+        
+        self.client.get(reverse('chat-room-messages', kwargs={'room_id': room.id}))
+        
+        self.assertEqual(
+            ChatRoomMembership.objects.get(room=room, user=self.user).unread_count, 0
+        )
+
+    def test_get_room_messages_with_reply(self):
+        """Test message list renders reply previews and sender names."""
+        self.user.first_name = 'Test'
+        self.user.last_name = 'User'
+        self.user.save()
+        original = ChatMessageService.create_message(
+            room=self.global_room,
+            sender=self.user,
+            content='Original'
+        )
+        ChatMessageService.create_message(
+            room=self.global_room,
+            sender=self.user,
+            content='Reply',
+            reply_to_id=original.id
+        )
+        
+        url = reverse('chat-room-messages', kwargs={'room_id': self.global_room.id})
+        response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        reply = response.data['messages'][0]
+        self.assertEqual(reply['sender']['full_name'], 'Test User')
+        self.assertEqual(reply['reply_to_preview']['sender_username'], 'testuser')
+        self.assertEqual(reply['reply_to_preview']['content_preview'], 'Original')
+
+    def test_message_rows_match_serializer(self):
+        """Test the values()-based message rows render like ChatMessageSerializer."""
+        original = ChatMessageService.create_message(
+            room=self.global_room,
+            sender=self.user,
+            content='x' * 60
+        )
+        ChatMessageService.create_message(
+            room=self.global_room,
+            sender=self.user,
+            content='Reply',
+            reply_to_id=original.id
+        )
+        request = APIRequestFactory().get('/')
+        request.user = self.user
+        queryset = ChatMessage.objects.filter(room=self.global_room).order_by('created_at')
+        
+        expected = ChatMessageSerializer(queryset, many=True, context={'request': request}).data
+        rows = serialize_message_rows(queryset.values(*MESSAGE_ROW_FIELDS), request)
+        
+        renderer = ORJSONRenderer()
+        self.assertEqual(json.loads(renderer.render(rows)), json.loads(renderer.render(expected)))
+
     def test_search_messages(self):
         """Test searching messages."""
         ChatMessageService.create_message(
@@ -355,15 +1145,43 @@ class ChatRoomAPITest(APITestCase):
     def test_unread_counts(self):
         """Test getting unread message counts."""
         url = reverse('chat-unread-counts')
-        response = self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('total_unread', response.data)
 
+    def test_unread_counts_by_room(self):
+        """Test unread counts come from memberships in one query."""
+        room, _ = ChatRoomService.get_or_create_private_room(self.user, self.other_user)
+        ChatRoomMembership.objects.filter(room=room).update(
+            last_read_at=timezone.now() - timedelta(minutes=1)
+        )
+        ChatMessageService.create_message(room=room, sender=self.other_user, content='Hi')
+        ChatMessageService.create_message(room=room, sender=self.other_user, content='There')
+        ChatMessageService.create_message(room=self.global_room, sender=self.other_user, content='All')
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('chat-unread-counts'))
+        
+        self.assertEqual(response.data['total_unread'], 2)
+        self.assertEqual(response.data['by_room'], {
+            str(room.id): {'name': room.name, 'unread_count': 2, 'room_type': 'private'},
+        })
+
 
 class ChatConsumerTest(TransactionTestCase):
     """Tests for WebSocket consumers."""
 
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from channels.routing import URLRouter
+        from .routing import websocket_urlpatterns
+        
+        # Build the routing table once for every test in the class
+        cls.router = URLRouter(websocket_urlpatterns)
+
     async def test_connect_authenticated(self):
         """Test WebSocket connection with authentication."""
         # This test requires a proper JWT token setup
@@ -372,9 +1190,11 @@ class ChatConsumerTest(TransactionTestCase):
 
     async def test_connect_unauthenticated(self):
         """Test WebSocket connection without authentication."""
+        from channels.testing import WebsocketCommunicator
+        
         # Create communicator without token
         communicator = WebsocketCommunicator(
-            URLRouter(websocket_urlpatterns),
+            self.router,
             '/ws/chat/test-room/'
         )
         
@@ -386,8 +1206,372 @@ class ChatConsumerTest(TransactionTestCase):
             await communicator.disconnect()
 
 
+class FrameTemplateTest(TestCase):
+    """Tests for precomputed WebSocket frame templates."""
+
+    def test_typing_frame(self):
+        """Test typing frame renders valid JSON with escaped username."""
+        frame = _typing_frame({'user_id': 1, 'username': 'a"b', 'is_typing': True})
+        
+        self.assertEqual(json.loads(frame), {
+            'type': 'typing', 'user_id': 1, 'username': 'a"b', 'is_typing': True,
+        })
+
+    def test_read_receipt_frame(self):
+        """Test read receipt frame handles a missing message_id."""
+        frame = _read_receipt_frame({'user_id': 1, 'username': 'alice'})
+        
+        self.assertEqual(json.loads(frame), {
+            'type': 'read_receipt', 'user_id': 1, 'username': 'alice', 'message_id': None,
+        })
+
+    def test_presence_frame(self):
+        """Test presence frame uses the given type."""
+        frame = _presence_frame('user_left', {'user_id': 2, 'username': 'bob'})
+        
+        self.assertEqual(json.loads(frame), {
+            'type': 'user_left', 'user_id': 2, 'username': 'bob',
+        })
+
+
+class FakeChannelLayer:
+    """Channel layer stand-in that records group sends."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, event):
+        self.sent.append((group, event))
+
+
+class FlakyChannelLayer(FakeChannelLayer):
+    """Channel layer stand-in whose first group send fails."""
+
+    async def group_send(self, group, event):
+        if not hasattr(self, 'failed'):
+            self.failed = True
+            raise ConnectionError('layer unavailable')
+        await super().group_send(group, event)
+
+
+class FakeConsumer:
+    """Consumer stand-in that records errors sent to the client."""
+
+    def __init__(self, channel_layer):
+        self.channel_layer = channel_layer
+        self.room_group_name = 'chat_test'
+        self.closed = False
+        self.errors = []
+
+    async def send_error(self, message):
+        self.errors.append(message)
+
+
+class MessageOutboxTest(TestCase):
+    """Tests for the batched message outbox."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.room = ChatRoomService.create_global_room('Global', self.user)
+
+    async def test_flush_saves_and_broadcasts_in_order(self):
+        """Test a batch is saved and broadcast in queue order."""
+        layer = FakeChannelLayer()
+        consumer = FakeConsumer(layer)
+        batch = [
+            MessageOutbox.entry(
+                consumer, ChatMessage(room=self.room, sender=self.user, content=f'Message {i}')
+            )
+            for i in range(3)
+        ]
+        
+        await MessageOutbox()._flush(batch)
+        
+        self.assertEqual(await ChatMessage.objects.filter(room=self.room).acount(), 3)
+        self.assertEqual(
+            [json.loads(event['frame'])['message']['content'] for _, event in layer.sent],
+            ['Message 0', 'Message 1', 'Message 2']
+        )
+        self.assertEqual(consumer.errors, [])
+
+    async def test_failed_broadcast_does_not_stop_batch(self):
+        """Test one failing group send doesn't keep later messages from going out."""
+        layer = FlakyChannelLayer()
+        consumer = FakeConsumer(layer)
+        batch = [
+            MessageOutbox.entry(
+                consumer, ChatMessage(room=self.room, sender=self.user, content=f'Message {i}')
+            )
+            for i in range(3)
+        ]
+        
+        await MessageOutbox()._flush(batch)
+        
+        self.assertEqual(
+            [json.loads(event['frame'])['message']['content'] for _, event in layer.sent],
+            ['Message 1', 'Message 2']
+        )
+
+
+class MessageOutboxFallbackTest(TransactionTestCase):
+    """
+    Tests for the outbox's one-by-one fallback. Needs real commits: foreign
+    keys are checked when the bulk insert's transaction commits.
+    """
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.room = ChatRoomService.create_global_room('Global', self.user)
+        self.layer = FakeChannelLayer()
+
+    def _batch(self, consumer, bad_consumer):
+        return [
+            MessageOutbox.entry(consumer, ChatMessage(room=self.room, sender=self.user, content='First')),
+            MessageOutbox.entry(bad_consumer, ChatMessage(
+                room=self.room, sender=self.user, content='Dangling', reply_to_id=uuid4()
+            )),
+            MessageOutbox.entry(consumer, ChatMessage(room=self.room, sender=self.user, content='Last')),
+        ]
+
+    async def test_bad_message_does_not_drop_batch(self):
+        """Test a failed bulk insert saves and broadcasts the good messages."""
+        consumer = FakeConsumer(self.layer)
+        bad_consumer = FakeConsumer(self.layer)
+        
+        await MessageOutbox()._flush(self._batch(consumer, bad_consumer))
+        
+        contents = [
+            content async for content in
+            ChatMessage.objects.order_by('created_at').values_list('content', flat=True)
+        ]
+        self.assertEqual(contents, ['First', 'Last'])
+        self.assertEqual(
+            [json.loads(event['frame'])['message']['content'] for _, event in self.layer.sent],
+            ['First', 'Last']
+        )
+        self.assertEqual(bad_consumer.errors, ['Failed to save message'])
+        self.assertEqual(consumer.errors, [])
+
+    async def test_disconnected_consumer_is_skipped(self):
+        """Test no error is sent to a consumer that has disconnected."""
+        consumer = FakeConsumer(self.layer)
+        bad_consumer = FakeConsumer(self.layer)
+        bad_consumer.closed = True
+        bad_consumer.send_error = mock.AsyncMock(side_effect=RuntimeError('socket closed'))
+        
+        await MessageOutbox()._flush(self._batch(consumer, bad_consumer))
+        
+        bad_consumer.send_error.assert_not_called()
+        self.assertEqual(len(self.layer.sent), 2)
+
+
+class ChatConsumerThrottleTest(TestCase):
+    """Tests for typing/read event throttling in ChatConsumer."""
+
+    def setUp(self):
+        """Set up a consumer wired to a fake channel layer."""
+        self.consumer = ChatConsumer()
+        self.consumer.channel_layer = FakeChannelLayer()
+        self.consumer.channel_name = 'test.channel'
+        self.consumer.room_group_name = 'chat_test'
+        self.consumer.user = User(id=1, username='testuser')
+
+    async def test_repeated_typing_is_throttled(self):
+        """Test repeated typing events with the same state are dropped."""
+        await self.consumer.handle_typing({'is_typing': True})
+        await self.consumer.handle_typing({'is_typing': True})
+        await self.consumer.handle_typing({'is_typing': False})
+        
+        sent = [event['is_typing'] for _, event in self.consumer.channel_layer.sent]
+        self.assertEqual(sent, [True, False])
+
+    async def test_own_read_receipt_not_echoed(self):
+        """Test the sending channel skips its own read receipt."""
+        sent = []
+        
+        async def send(text_data=None, bytes_data=None, close=False):
+            sent.append(text_data)
+        
+        self.consumer.send = send
+        await self.consumer.read_receipt_broadcast({
+            'sender_channel': 'test.channel', 'user_id': 1, 'username': 'testuser',
+        })
+        await self.consumer.read_receipt_broadcast({
+            'sender_channel': 'other.channel', 'user_id': 2, 'username': 'other',
+        })
+        
+        self.assertEqual(len(sent), 1)
+
+
+class ChatConsumerRoomStateTest(TestCase):
+    """Tests for loading room state when a ChatConsumer connects."""
+
+    def setUp(self):
+        """Set up a private room with two members and an outsider."""
+        self.user1, self.user2, self.outsider = [
+            User.objects.create_user(
+                username=name,
+                email=f'{name}@example.com',
+                password='testpass123'
+            )
+            for name in ('user1', 'user2', 'outsider')
+        ]
+        self.room, _ = ChatRoomService.get_or_create_private_room(self.user1, self.user2)
+
+    def load(self, user, room_id):
+        consumer = ChatConsumer()
+        consumer.user = user
+        consumer.room_id = str(room_id)
+        return async_to_sync(consumer.load_room_state)()
+
+    def test_member_is_granted_with_participants(self):
+        """Test a member gets the room, access and participant set."""
+        with self.assertNumQueries(2):
+            room, has_access, participant_ids = self.load(self.user2, self.room.id)
+        
+        self.assertEqual(room, self.room)
+        self.assertTrue(has_access)
+        self.assertEqual(participant_ids, {self.user1.id, self.user2.id})
+
+    def test_outsider_and_missing_room(self):
+        """Test non-members are denied and unknown rooms return None."""
+        self.assertFalse(self.load(self.outsider, self.room.id)[1])
+        self.assertEqual(self.load(self.user1, uuid4()), (None, False, frozenset()))
+
+
+class GroupKeyCachingChannelLayerTest(TestCase):
+    """Tests for the group-key caching Redis channel layer."""
+
+    def test_group_key_is_memoized(self):
+        """Test group keys are built once and invalid names are still rejected."""
+        layer = GroupKeyCachingRedisChannelLayer()
+        
+        key = layer._group_key('chat_room')
+        self.assertEqual(key, b'asgi:group:chat_room')
+        self.assertIs(layer._group_key('chat_room'), key)
+        self.assertTrue(layer.valid_group_name('chat_room'))
+        with self.assertRaises(TypeError):
+            layer.valid_group_name('chat room!')
+
+
+class WebSocketAuthTest(TestCase):
+    """Tests for WebSocket JWT authentication helpers."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def test_token_user_is_cached(self):
+        """Test a second lookup for the same token skips the database."""
+        token = AccessToken.for_user(self.user)
+        
+        self.assertEqual(get_token_user(token).id, self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_token_user(token).id, self.user.id)
+
+    def test_token_user_role_change(self):
+        """Test a role change reaches the next lookup instead of the cached user."""
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(get_token_user(token).role, self.user.role)
+        
+        self.user.role = 'admin'
+        self.user.save(update_fields=['role'])
+        self.assertEqual(get_token_user(token).role, 'admin')
+        
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            get_token_user(token)
+
+    async def test_middleware_resolves_token_user(self):
+        """Test the middleware resolves users from the database, then the cache."""
+        token = str(AccessToken.for_user(self.user))
+        middleware = JWTAuthMiddleware(None)
+        
+        user_id = self.user.id
+        user = await middleware.get_user_from_token(token)
+        self.assertEqual(user.id, user_id)
+        
+        await self.user.adelete()
+        user = await middleware.get_user_from_token(token)
+        self.assertFalse(user.is_authenticated)
+        
+        user = await middleware.get_user_from_token('not-a-token')
+        self.assertFalse(user.is_authenticated)
+
+    def test_token_user_inactive_or_missing(self):
+        """Test cached users that are deactivated or deleted resolve to None."""
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(get_token_user(token).id, self.user.id)
+        
+        self.user.is_active = False
+        self.user.save()
+        
+        self.assertIsNone(get_token_user(token))
+        
+        self.user.delete()
+        self.assertIsNone(get_token_user(token))
+
+    def test_decode_access_token(self):
+        """Test local JWT verification accepts access tokens only."""
+        token = AccessToken.for_user(self.user)
+        
+        payload = decode_access_token(str(token))
+        self.assertEqual(payload['user_id'], token['user_id'])
+        self.assertEqual(payload['jti'], token['jti'])
+        
+        self.assertIsNone(decode_access_token(str(RefreshToken.for_user(self.user))))
+        self.assertIsNone(decode_access_token(str(token)[:-2] + 'xx'))
+        
+        token.set_exp(lifetime=-timedelta(seconds=1))
+        self.assertIsNone(decode_access_token(str(token)))
+
+    def test_decode_access_token_memoized(self):
+        """Test a reconnect with the same token skips verification until it expires."""
+        token = AccessToken.for_user(self.user)
+        decode_access_token(str(token))
+        
+        with mock.patch('apps.chat.middleware.jwt.decode') as decode:
+            self.assertEqual(decode_access_token(str(token))['jti'], token['jti'])
+            decode.assert_not_called()
+        
+        with mock.patch('apps.chat.middleware.time.time', return_value=token['exp'] + 1):
+            with mock.patch('apps.chat.middleware.jwt.decode', side_effect=jwt.ExpiredSignatureError):
+                self.assertIsNone(decode_access_token(str(token)))
+
+    def test_query_param(self):
+        """Test token extraction matches parse_qs first-value semantics."""
+        self.assertEqual(query_param(b'api_token=x&token=a%2Bb+c', b'token'), 'a+b c')
+        self.assertEqual(query_param(b'api_token=x', b'api_token'), 'x')
+        self.assertEqual(query_param(b'token=&token=z', b'token'), 'z')
+        self.assertIsNone(query_param(b'api_token=x', b'token'))
+        self.assertIsNone(query_param(b'', b'token'))
+
+    def test_bearer_token(self):
+        """Test bearer token extraction from raw ASGI headers."""
+        headers = [(b'host', b'example.com'), (b'authorization', b'Bearer abc.def')]
+        self.assertEqual(bearer_token(headers), 'abc.def')
+        self.assertIsNone(bearer_token([(b'authorization', b'Basic abc')]))
+        self.assertIsNone(bearer_token([]))
+
+
 # Integration test example
-class ChatIntegrationTest(TransactionTestCase):
+class ChatIntegrationTest(TestCase):
     """Integration tests for chat flow."""
 
     def test_full_chat_flow(self):
@@ -426,3 +1610,20 @@ class ChatIntegrationTest(TransactionTestCase):
             password='testpass123'
         )
         self.assertFalse(ChatRoomService.check_room_access(room, user3))
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    """Tests for the chat.W001 deploy check."""
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_warns(self):
+        """Test a per-process default cache is reported."""
+        self.assertEqual([w.id for w in check_shared_cache(None)], ['chat.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    }})
+    def test_shared_cache_passes(self):
+        """Test a shared default cache is accepted."""
+        self.assertEqual(check_shared_cache(None), [])
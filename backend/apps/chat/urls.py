@@ -25,6 +25,7 @@ from .views import (
     # Utility views
     MessageSearchView,
     MarkReadView,
+    MarkRoomsReadView,
     OnlineUsersView,
     UnreadCountView,
     UserListView,
@@ -156,6 +157,14 @@ urlpatterns = [
         name='chat-message-search'
     ),
     
+    # Mark several rooms as read at once
+    # POST /api/v1/chat/rooms/mark-read/
+    path(
+        'rooms/mark-read/',
+        MarkRoomsReadView.as_view(),
+        name='chat-rooms-mark-read'
+    ),
+    
     # Get unread message counts
     # GET /api/v1/chat/unread/
     path(
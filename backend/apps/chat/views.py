@@ -4,9 +4,14 @@ REST API views for chat functionality.
 All views are class-based APIViews for explicit URL mapping.
 """
 import logging
+import time
+from uuid import UUID
 
-from django.db.models import Q
+from django.core.cache import cache
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
@@ -18,14 +23,25 @@ from .models import ChatRoom, ChatMessage, ChatRoomMembership
 from .serializers import (
     ChatRoomListSerializer,
     ChatRoomDetailSerializer,
+    ChatRoomMembershipSerializer,
     ChatMessageSerializer,
     CreatePrivateRoomSerializer,
     CreateProjectRoomSerializer,
     AddParticipantSerializer,
     RoomSettingsSerializer,
     MessageSearchSerializer,
+    MarkRoomsReadSerializer,
+    CHAT_USER_LIST_CACHE_KEY,
+    CHAT_USER_LIST_CACHE_TTL,
+    CHAT_USER_LIST_FIELDS,
+    GLOBAL_ROOM_CACHE_KEY,
+    GLOBAL_ROOM_CACHE_TTL,
+    MESSAGE_ROW_FIELDS,
+    serialize_message_rows,
+)
+from .services import (
+    ChatRoomService, ChatMessageService, ChatPermissionService, ROOM_LIST_API_CACHE_TTL,
 )
-from .services import ChatRoomService, ChatMessageService, ChatPermissionService
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -42,19 +58,13 @@ class UserListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        users = User.objects.filter(
-            is_active=True
-        ).exclude(
-            id=request.user.id
-        ).values(
-            'id', 
-            'username', 
-            'email', 
-            'first_name', 
-            'last_name'
-        )
+        # One cached list serves every caller; only the exclusion is per user
+        users = cache.get(CHAT_USER_LIST_CACHE_KEY)
+        if users is None:
+            users = list(User.objects.filter(is_active=True).values(*CHAT_USER_LIST_FIELDS))
+            cache.set(CHAT_USER_LIST_CACHE_KEY, users, CHAT_USER_LIST_CACHE_TTL)
         
-        return Response(list(users))
+        return Response([user for user in users if user['id'] != request.user.id])
     
 class ChatRoomListView(APIView):
     """
@@ -78,35 +88,65 @@ class ChatRoomListView(APIView):
     def get(self, request):
         """Get all rooms accessible by current user."""
         user = request.user
+        room_type = request.query_params.get('type')
+        project_id = request.query_params.get('project_id')
+        
+        # Serve the last response unless one of its rooms or the user's
+        # memberships changed since (see ChatRoomService.touch_room_lists)
+        cache_key = ChatRoomService.room_list_api_cache_key(user.id, room_type, project_id)
+        cached = ChatRoomService.get_cached_room_list(cache_key, user.id)
+        if cached is not None:
+            return Response(cached)
+        computed_at = time.time()
         
         # Base query - rooms user has access to
         queryset = ChatRoom.objects.filter(is_active=True)
         
-        # Filter rooms user can access
+        # Filter rooms user can access; EXISTS avoids the participants
+        # join and the DISTINCT it needed
         queryset = queryset.filter(
             Q(room_type=ChatRoom.RoomType.GLOBAL) |
-            Q(participants=user)
-        ).distinct()
+            Exists(ChatRoomMembership.objects.filter(room=OuterRef('pk'), user=user))
+        )
         
         # Optional filter by room type
-        room_type = request.query_params.get('type')
         if room_type:
             queryset = queryset.filter(room_type=room_type)
         
         # Optional filter by project
-        project_id = request.query_params.get('project_id')
         if project_id:
             queryset = queryset.filter(project_id=project_id)
         
         queryset = queryset.order_by('-updated_at')
         
+        # Last message and unread counts are denormalized columns; only the
+        # participant count is still computed in SQL
+        queryset = queryset.annotate(
+            participant_count=Coalesce(Subquery(
+                ChatRoomMembership.objects.filter(room=OuterRef('pk'))
+                .order_by().values('room').annotate(count=Count('id')).values('count')
+            ), 0),
+        ).prefetch_related(
+            Prefetch(
+                'memberships',
+                queryset=ChatRoomMembership.objects.filter(user=user),
+                to_attr='my_memberships'
+            )
+        )
+        
         serializer = ChatRoomListSerializer(
             queryset,
             many=True,
             context={'request': request}
         )
+        rooms = serializer.data
         
-        return Response(serializer.data)
+        ChatRoomService.cache_room_list(
+            cache_key, computed_at, [str(room['id']) for room in rooms], list(rooms),
+            ROOM_LIST_API_CACHE_TTL
+        )
+        
+        return Response(rooms)
 
 
 class ChatRoomDetailView(APIView):
@@ -123,16 +163,21 @@ class ChatRoomDetailView(APIView):
     )
     def get(self, request, room_id):
         """Get detailed room information."""
-        room = get_object_or_404(ChatRoom, id=room_id, is_active=True)
+        room, has_access = ChatRoomService.get_accessible_room(request.user, room_id)
+        if room is None:
+            raise Http404
         
         # Check access permission
-        if not ChatRoomService.check_room_access(room, request.user):
+        if not has_access:
             return Response(
                 {'error': 'Access denied to this room'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        serializer = ChatRoomDetailSerializer(room, context={'request': request})
+        serializer = ChatRoomDetailSerializer(
+            ChatRoomDetailSerializer.prefetch(room),
+            context={'request': request}
+        )
         return Response(serializer.data)
 
 
@@ -150,13 +195,25 @@ class GetGlobalRoomView(APIView):
     )
     def get(self, request):
         """Get the global chat room, creating it if it doesn't exist."""
-        room = ChatRoomService.create_global_room(
-            name="Global Chat",
-            created_by=request.user
-        )
+        data = cache.get(GLOBAL_ROOM_CACHE_KEY)
+        if data is None:
+            room = ChatRoomService.create_global_room(
+                name="Global Chat",
+                created_by=request.user
+            )
+            # Serialized without a request, so current_user_membership is None
+            data = dict(ChatRoomDetailSerializer(ChatRoomDetailSerializer.prefetch(room)).data)
+            cache.set(GLOBAL_ROOM_CACHE_KEY, data, GLOBAL_ROOM_CACHE_TTL)
         
-        serializer = ChatRoomDetailSerializer(room, context={'request': request})
-        return Response(serializer.data)
+        membership = ChatRoomMembership.objects.filter(
+            room_id=data['id'],
+            user=request.user
+        ).select_related('user').first()
+        
+        return Response({
+            **data,
+            'current_user_membership': ChatRoomMembershipSerializer(membership).data if membership else None,
+        })
 
 
 class CreatePrivateRoomView(APIView):
@@ -184,7 +241,7 @@ class CreatePrivateRoomView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         
-        other_user = User.objects.get(id=serializer.validated_data['user_id'])
+        other_user = serializer.validated_data['user']
         
         room, created = ChatRoomService.get_or_create_private_room(
             request.user,
@@ -192,7 +249,7 @@ class CreatePrivateRoomView(APIView):
         )
         
         response_serializer = ChatRoomDetailSerializer(
-            room,
+            ChatRoomDetailSerializer.prefetch(room),
             context={'request': request}
         )
         
@@ -230,7 +287,7 @@ class CreateProjectRoomView(APIView):
         room = ChatRoomService.create_project_room(project, request.user)
         
         response_serializer = ChatRoomDetailSerializer(
-            room,
+            ChatRoomDetailSerializer.prefetch(room),
             context={'request': request}
         )
         
@@ -248,7 +305,9 @@ class JoinRoomView(APIView):
     @extend_schema(summary="Join a chat room")
     def post(self, request, room_id):
         """Join a chat room (for project rooms with open access)."""
-        room = get_object_or_404(ChatRoom, id=room_id, is_active=True)
+        room = ChatRoomService.get_active_room(room_id)
+        if room is None:
+            raise Http404
         
         if room.room_type == ChatRoom.RoomType.PRIVATE:
             return Response(
@@ -276,7 +335,9 @@ class LeaveRoomView(APIView):
     @extend_schema(summary="Leave a chat room")
     def post(self, request, room_id):
         """Leave a chat room."""
-        room = get_object_or_404(ChatRoom, id=room_id, is_active=True)
+        room = ChatRoomService.get_active_room(room_id)
+        if room is None:
+            raise Http404
         
         if room.room_type == ChatRoom.RoomType.GLOBAL:
             return Response(
@@ -313,7 +374,9 @@ class AddParticipantView(APIView):
     )
     def post(self, request, room_id):
         """Add a participant to a room. Requires room management permission."""
-        room = get_object_or_404(ChatRoom, id=room_id, is_active=True)
+        room = ChatRoomService.get_active_room(room_id)
+        if room is None:
+            raise Http404
         
         # Check permission to manage room
         if not ChatPermissionService.can_manage_room(request.user, room):
@@ -325,7 +388,7 @@ class AddParticipantView(APIView):
         serializer = AddParticipantSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        user = User.objects.get(id=serializer.validated_data['user_id'])
+        user = serializer.validated_data['user']
         room_role = serializer.validated_data.get('room_role', 'member')
         
         membership = ChatRoomService.add_participant(room, user, room_role)
@@ -353,30 +416,33 @@ class RoomSettingsView(APIView):
     )
     def patch(self, request, room_id):
         """Update user's room settings (e.g., mute notifications)."""
-        room = get_object_or_404(ChatRoom, id=room_id, is_active=True)
+        room = ChatRoomService.get_active_room(room_id)
+        if room is None:
+            raise Http404
         
-        membership = ChatRoomMembership.objects.filter(
-            room=room,
-            user=request.user
-        ).first()
+        serializer = RoomSettingsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        if not membership:
+        membership = ChatRoomMembership.objects.filter(room=room, user=request.user)
+        
+        # A single UPDATE doubles as the membership check
+        if 'is_muted' in serializer.validated_data:
+            is_muted = serializer.validated_data['is_muted']
+            found = membership.update(is_muted=is_muted) > 0
+        else:
+            is_muted = membership.values_list('is_muted', flat=True).first()
+            found = is_muted is not None
+        
+        if not found:
             return Response(
                 {'error': 'You are not a member of this room'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        serializer = RoomSettingsSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        
-        if 'is_muted' in serializer.validated_data:
-            membership.is_muted = serializer.validated_data['is_muted']
-            membership.save(update_fields=['is_muted'])
-        
         return Response({
             'message': 'Settings updated successfully',
             'room_id': str(room.id),
-            'is_muted': membership.is_muted,
+            'is_muted': is_muted,
         })
 
 
@@ -407,59 +473,54 @@ class RoomMessagesListView(APIView):
     )
     def get(self, request, room_id):
         """Get paginated messages for a room."""
-        room = get_object_or_404(ChatRoom, id=room_id, is_active=True)
+        room, has_access = ChatRoomService.get_accessible_room(request.user, room_id)
+        if room is None:
+            raise Http404
         
         # Check access permission
-        if not ChatRoomService.check_room_access(room, request.user):
+        if not has_access:
             return Response(
                 {'error': 'Access denied to this room'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Build query
+        # Build query; rows are read as plain dicts (sender and reply joined)
         queryset = ChatMessage.objects.filter(
             room=room,
             is_deleted=False
-        ).select_related('sender', 'reply_to').order_by('-created_at')
+        ).order_by('-created_at', '-id')
         
-        # Cursor-based pagination
+        # Cursor-based pagination on (created_at, id), in the same query
         before = request.query_params.get('before')
         after = request.query_params.get('after')
+        try:
+            before = UUID(before) if before else None
+            after = UUID(after) if after else None
+        except ValueError:
+            return Response(
+                {'error': 'before and after must be message UUIDs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         limit = int(request.query_params.get('limit', 50))
         limit = min(limit, 100)  # Max 100 messages
         
-        if before:
-            try:
-                before_msg = ChatMessage.objects.get(id=before)
-                queryset = queryset.filter(created_at__lt=before_msg.created_at)
-            except ChatMessage.DoesNotExist:
-                pass
-        
+        queryset = ChatMessageService.apply_cursor(queryset, room.id, before=before, after=after)
         if after:
-            try:
-                after_msg = ChatMessage.objects.get(id=after)
-                queryset = queryset.filter(created_at__gt=after_msg.created_at)
-                queryset = queryset.order_by('created_at')  # Reverse order for after
-            except ChatMessage.DoesNotExist:
-                pass
+            queryset = queryset.order_by('created_at', 'id')  # Reverse order for after
         
-        messages = list(queryset[:limit])
+        messages = list(queryset.values(*MESSAGE_ROW_FIELDS)[:limit])
         
-        # Reverse if paginating with 'after'
+        # Reverse if paginating with 'after' (in place; no second list)
         if after:
-            messages = list(reversed(messages))
+            messages.reverse()
         
-        serializer = ChatMessageSerializer(
-            messages,
-            many=True,
-            context={'request': request}
-        )
-        
-        # Mark messages as read
-        ChatMessageService.mark_messages_as_read(room, request.user)
+        # Mark messages as read; the unread counter came with the room, so
+        # the common nothing-unread page load skips the membership lookup
+        if room.user_unread_count:
+            ChatMessageService.mark_messages_as_read(room, request.user)
         
         return Response({
-            'messages': serializer.data,
+            'messages': serialize_message_rows(messages, request),
             'count': len(messages),
             'has_more': len(messages) == limit,
         })
@@ -479,17 +540,26 @@ class RoomMessageDetailView(APIView):
     )
     def get(self, request, room_id, message_id):
         """Get a single message's details."""
-        room = get_object_or_404(ChatRoom, id=room_id, is_active=True)
+        room, has_access = ChatRoomService.get_accessible_room(request.user, room_id)
+        if room is None:
+            raise Http404
         
         # Check access permission
-        if not ChatRoomService.check_room_access(room, request.user):
+        if not has_access:
             return Response(
                 {'error': 'Access denied to this room'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        # The serializer reads sender, reply_to and reply_to.sender; only()
+        # keeps the joined user rows to the columns it renders
         message = get_object_or_404(
-            ChatMessage,
+            ChatMessage.objects.select_related('sender', 'reply_to__sender').only(
+                'id', 'room', 'message_type', 'content', 'attachment', 'attachment_name',
+                'created_at', 'updated_at', 'is_deleted',
+                'sender__username', 'sender__full_name', 'sender__email',
+                'reply_to__content', 'reply_to__sender__username',
+            ),
             id=message_id,
             room=room,
             is_deleted=False
@@ -510,10 +580,12 @@ class MarkReadView(APIView):
     @extend_schema(summary="Mark room messages as read")
     def post(self, request, room_id):
         """Mark all messages in room as read for current user."""
-        room = get_object_or_404(ChatRoom, id=room_id, is_active=True)
+        room, has_access = ChatRoomService.get_accessible_room(request.user, room_id)
+        if room is None:
+            raise Http404
         
         # Check access permission
-        if not ChatRoomService.check_room_access(room, request.user):
+        if not has_access:
             return Response(
                 {'error': 'Access denied to this room'},
                 status=status.HTTP_403_FORBIDDEN
@@ -528,6 +600,35 @@ class MarkReadView(APIView):
         })
 
 
+class MarkRoomsReadView(APIView):
+    """
+    Mark all messages in several rooms as read.
+    
+    POST /api/v1/chat/rooms/mark-read/
+    Body: {"room_ids": ["<uuid>", ...]}
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Mark several rooms as read",
+        request=MarkRoomsReadSerializer
+    )
+    def post(self, request):
+        """Mark all messages in the given rooms as read for current user."""
+        serializer = MarkRoomsReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        count = ChatMessageService.mark_rooms_as_read(
+            request.user,
+            serializer.validated_data['room_ids']
+        )
+        
+        return Response({
+            'message': 'Rooms marked as read',
+            'marked_rooms': count,
+        })
+
+
 class OnlineUsersView(APIView):
     """
     Get online users in a room.
@@ -542,10 +643,12 @@ class OnlineUsersView(APIView):
     @extend_schema(summary="Get online users in room")
     def get(self, request, room_id):
         """Get users in the room (participants list)."""
-        room = get_object_or_404(ChatRoom, id=room_id, is_active=True)
+        room, has_access = ChatRoomService.get_accessible_room(request.user, room_id)
+        if room is None:
+            raise Http404
         
         # Check access permission
-        if not ChatRoomService.check_room_access(room, request.user):
+        if not has_access:
             return Response(
                 {'error': 'Access denied to this room'},
                 status=status.HTTP_403_FORBIDDEN
@@ -559,14 +662,15 @@ class OnlineUsersView(APIView):
                 'online_count': 0,  # Would need Redis to track actual online count
             })
         
-        participants = room.participants.filter(is_active=True).values(
+        # Materialized once; the count comes from the same rows
+        participants = list(room.participants.filter(is_active=True).values(
             'id', 'username', 'email'
-        )
+        ))
         
         return Response({
             'room_id': str(room.id),
-            'participants': list(participants),
-            'count': participants.count(),
+            'participants': participants,
+            'count': len(participants),
         })
 
 
@@ -621,16 +725,26 @@ class UnreadCountView(APIView):
     @extend_schema(summary="Get unread message counts")
     def get(self, request):
         """Get unread message counts per room and total."""
-        rooms_data = ChatRoomService.get_user_rooms(request.user)
-        
-        unread_by_room = {}
-        for room in rooms_data:
-            if room['unread_count'] > 0:
-                unread_by_room[room['id']] = {
-                    'name': room['name'],
-                    'unread_count': room['unread_count'],
-                    'room_type': room['room_type'],
-                }
+        # Counters are denormalized on memberships, so this is one query
+        # with no message scan or last-message hydration
+        unread_memberships = ChatRoomMembership.objects.filter(
+            user=request.user,
+            unread_count__gt=0,
+            room__is_active=True
+        ).exclude(
+            room__room_type=ChatRoom.RoomType.GLOBAL  # Global chat doesn't track unread
+        ).order_by(
+            F('room__last_message_at').desc(nulls_last=True)
+        ).values_list('room_id', 'room__name', 'room__room_type', 'unread_count')
+        
+        unread_by_room = {
+            str(room_id): {
+                'name': name,
+                'unread_count': unread_count,
+                'room_type': room_type,
+            }
+            for room_id, name, room_type, unread_count in unread_memberships
+        }
         
         total_unread = sum(r['unread_count'] for r in unread_by_room.values())
         
@@ -1,8 +1,16 @@
 from django.contrib import admin
+from django.db.models import Count
 
 from .models import Document, DocumentComment, GTVersion
 
 
+def is_changelist(model_admin, request):
+    """Return True when the request is for this admin's changelist page."""
+    opts = model_admin.model._meta
+    match = request.resolver_match
+    return match is not None and match.url_name == f"{opts.app_label}_{opts.model_name}_changelist"
+
+
 class GTVersionInline(admin.TabularInline):
     model = GTVersion
     extra = 0
@@ -15,9 +23,18 @@ class DocumentAdmin(admin.ModelAdmin):
     list_filter = ["project", "status", "file_type", "created_at"]
     search_fields = ["name", "description"]
     inlines = [GTVersionInline]
+    list_select_related = ["project"]
     
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).annotate(_version_count=Count("versions"))
+        if is_changelist(self, request):
+            # The list never shows these; the change form still loads them
+            queryset = queryset.defer("description", "metadata")
+        return queryset
+    
+    @admin.display(ordering="_version_count")
     def version_count(self, obj):
-        return obj.versions.count()
+        return obj.version_count
 
 
 @admin.register(GTVersion)
@@ -25,3 +42,10 @@ class GTVersionAdmin(admin.ModelAdmin):
     list_display = ["document", "version_number", "is_approved", "created_by", "created_at"]
     list_filter = ["is_approved", "created_at"]
     search_fields = ["document__name"]
+    list_select_related = ["document__project", "created_by"]
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if is_changelist(self, request):
+            queryset = queryset.defer("gt_data", "changes_from_previous")
+        return queryset
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-16 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("groundtruth", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="documentcomment",
+            index=models.Index(
+                fields=["document", "created_at"], name="document_co_documen_199324_idx"
+            ),
+        ),
+    ]
@@ -4,7 +4,8 @@ Ground Truth management models for ZanFlow.
 import uuid
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Max
 
 from apps.projects.models import Project
 from core.models import UserStampedModel
@@ -85,6 +86,9 @@ class Document(UserStampedModel):
     
     @property
     def version_count(self):
+        # Prefer the _version_count annotation when the queryset provides it
+        if hasattr(self, "_version_count"):
+            return self._version_count
         return self.versions.count()
 
 
@@ -141,10 +145,18 @@ class GTVersion(UserStampedModel):
         return f"{self.document.name} v{self.version_number}"
     
     def save(self, *args, **kwargs):
-        if not self.version_number:
-            last_version = GTVersion.objects.filter(document=self.document).order_by("-version_number").first()
-            self.version_number = (last_version.version_number + 1) if last_version else 1
-        super().save(*args, **kwargs)
+        if self.version_number:
+            super().save(*args, **kwargs)
+            return
+        
+        with transaction.atomic():
+            # Lock the document so concurrent saves number versions one at a time
+            Document.objects.select_for_update().filter(pk=self.document_id).exists()
+            last_number = GTVersion.objects.filter(
+                document_id=self.document_id
+            ).aggregate(last=Max("version_number"))["last"]
+            self.version_number = (last_number or 0) + 1
+            super().save(*args, **kwargs)
 
 
 class DocumentComment(UserStampedModel):
@@ -183,6 +195,9 @@ class DocumentComment(UserStampedModel):
     class Meta:
         db_table = "document_comments"
         ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["document", "created_at"]),
+        ]
     
     def __str__(self):
         return f"Comment on {self.document.name} by {self.created_by}"
@@ -1,6 +1,8 @@
 """
 Serializers for Ground Truth app.
 """
+from collections import defaultdict
+
 from django.utils import timezone
 from rest_framework import serializers
 
@@ -104,9 +106,13 @@ class DocumentCommentSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_by", "created_at"]
     
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return DocumentCommentSerializer(obj.replies.all(), many=True).data
-        return []
+        # Use the comment tree preloaded by DocumentDetailSerializer when present
+        children_by_parent = self.context.get("children_by_parent")
+        if children_by_parent is not None:
+            replies = children_by_parent.get(obj.id, [])
+        else:
+            replies = obj.replies.select_related("created_by")
+        return DocumentCommentSerializer(replies, many=True, context=self.context).data
 
 
 class DocumentSerializer(serializers.ModelSerializer):
@@ -135,9 +141,16 @@ class DocumentDetailSerializer(DocumentSerializer):
         fields = DocumentSerializer.Meta.fields + ["versions", "comments"]
     
     def get_comments(self, obj):
-        # Get only top-level comments
-        top_comments = obj.comments.filter(parent__isnull=True)
-        return DocumentCommentSerializer(top_comments, many=True).data
+        # Load the whole comment tree in one query and nest replies in Python
+        children_by_parent = defaultdict(list)
+        for comment in obj.comments.select_related("created_by"):
+            children_by_parent[comment.parent_id].append(comment)
+        
+        context = {**self.context, "children_by_parent": children_by_parent}
+        # Top-level comments are the ones without a parent
+        return DocumentCommentSerializer(
+            children_by_parent.get(None, []), many=True, context=context
+        ).data
 
 
 class DocumentCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,186 @@
+"""
+Tests for ground truth application.
+
+Run with: python manage.py test apps.groundtruth
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.projects.models import Project
+from .models import Document, DocumentComment, GTVersion
+from .serializers import DocumentDetailSerializer
+
+User = get_user_model()
+
+
+class GTVersionModelTest(TestCase):
+    """Tests for GTVersion model."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        cls.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        cls.project = Project.objects.create(name='Invoices', created_by=cls.user)
+        cls.document = Document.objects.create(
+            project=cls.project,
+            name='invoice.pdf',
+            created_by=cls.user
+        )
+
+    def test_versions_are_numbered_per_document(self):
+        """Test new versions get the next number within their document."""
+        versions = [
+            GTVersion.objects.create(document=self.document, gt_data={'total': i}, created_by=self.user)
+            for i in range(3)
+        ]
+        other_document = Document.objects.create(
+            project=self.project,
+            name='receipt.pdf',
+            created_by=self.user
+        )
+        other_version = GTVersion.objects.create(document=other_document, created_by=self.user)
+        
+        self.assertEqual([v.version_number for v in versions], [1, 2, 3])
+        self.assertEqual(other_version.version_number, 1)
+
+    def test_explicit_version_number_is_kept(self):
+        """Test an explicit version number is saved as given and numbering continues after it."""
+        imported = GTVersion.objects.create(
+            document=self.document,
+            version_number=7,
+            created_by=self.user
+        )
+        next_version = GTVersion.objects.create(document=self.document, created_by=self.user)
+        
+        self.assertEqual(imported.version_number, 7)
+        self.assertEqual(next_version.version_number, 8)
+
+    def test_resave_keeps_version_number(self):
+        """Test saving an existing version doesn't renumber it."""
+        version = GTVersion.objects.create(document=self.document, created_by=self.user)
+        GTVersion.objects.create(document=self.document, created_by=self.user)
+        
+        version.change_summary = 'Fixed total'
+        version.save()
+        
+        version.refresh_from_db()
+        self.assertEqual(version.version_number, 1)
+
+
+class DocumentAdminTest(TestCase):
+    """Tests for the document admin changelist."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        cls.admin_user = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='testpass123'
+        )
+        cls.project = Project.objects.create(name='Invoices', created_by=cls.admin_user)
+
+    def setUp(self):
+        """Log in as a superuser."""
+        self.client.force_login(self.admin_user)
+
+    def _add_document(self, name, versions):
+        document = Document.objects.create(project=self.project, name=name, created_by=self.admin_user)
+        for _ in range(versions):
+            GTVersion.objects.create(document=document, created_by=self.admin_user)
+        return document
+
+    def _changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_version_counts_are_annotated(self):
+        """Test version counts don't cost a query per row."""
+        url = reverse('admin:groundtruth_document_changelist')
+        self._add_document('a.pdf', versions=1)
+        _, one_row = self._changelist_queries(url)
+        
+        self._add_document('b.pdf', versions=2)
+        self._add_document('c.pdf', versions=0)
+        response, three_rows = self._changelist_queries(url)
+        
+        self.assertEqual(three_rows, one_row)
+        counts = {
+            document.name: document.version_count
+            for document in response.context['cl'].result_list
+        }
+        self.assertEqual(counts, {'a.pdf': 1, 'b.pdf': 2, 'c.pdf': 0})
+
+    def test_version_count_without_annotation(self):
+        """Test version_count falls back to counting on plain instances."""
+        document = self._add_document('a.pdf', versions=2)
+        
+        self.assertEqual(Document.objects.get(id=document.id).version_count, 2)
+
+    def test_changelists_defer_json_columns(self):
+        """Test list pages skip the JSON columns and change forms load them."""
+        document = self._add_document('a.pdf', versions=1)
+        
+        response = self.client.get(reverse('admin:groundtruth_document_changelist'))
+        row = response.context['cl'].result_list[0]
+        self.assertEqual(row.get_deferred_fields(), {'description', 'metadata'})
+        
+        response = self.client.get(reverse('admin:groundtruth_gtversion_changelist'))
+        row = response.context['cl'].result_list[0]
+        self.assertEqual(row.get_deferred_fields(), {'gt_data', 'changes_from_previous'})
+        
+        response = self.client.get(reverse('admin:groundtruth_document_change', args=[document.id]))
+        self.assertEqual(response.context['original'].get_deferred_fields(), set())
+
+
+class DocumentDetailSerializerTest(TestCase):
+    """Tests for DocumentDetailSerializer comment threads."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up a document with a three-level thread and a second top-level comment."""
+        cls.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        project = Project.objects.create(name='Invoices', created_by=cls.user)
+        cls.document = Document.objects.create(project=project, name='invoice.pdf', created_by=cls.user)
+        
+        root = DocumentComment.objects.create(document=cls.document, content='Total is off', created_by=cls.user)
+        reply = DocumentComment.objects.create(
+            document=cls.document, content='Which line?', parent=root, created_by=cls.user
+        )
+        DocumentComment.objects.create(
+            document=cls.document, content='Line 3', parent=reply, created_by=cls.user
+        )
+        DocumentComment.objects.create(document=cls.document, content='Date format', created_by=cls.user)
+
+    def test_comment_thread_is_nested(self):
+        """Test replies nest under their parents with top-level comments in order."""
+        comments = DocumentDetailSerializer(self.document).data['comments']
+        
+        self.assertEqual([c['content'] for c in comments], ['Total is off', 'Date format'])
+        reply = comments[0]['replies'][0]
+        self.assertEqual(reply['content'], 'Which line?')
+        self.assertEqual(reply['replies'][0]['content'], 'Line 3')
+        self.assertEqual(reply['replies'][0]['replies'], [])
+        self.assertEqual(reply['replies'][0]['created_by']['username'], 'testuser')
+        self.assertEqual(comments[1]['replies'], [])
+
+    def test_comment_thread_query_count(self):
+        """Test the thread loads in one query however deep it is."""
+        document = Document.objects.get(id=self.document.id)
+        serializer = DocumentDetailSerializer(document)
+        
+        with self.assertNumQueries(1):
+            serializer.get_comments(document)
@@ -5,10 +5,11 @@ from django.conf import settings  # Import settings for AWS URL construction
 from django_filters import rest_framework as filters
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 
 from apps.audit.services import get_object_history, log_action
+from core.parsers import ORJSONParser
 from django.db.models import Q
 from .models import Document, DocumentComment, GTVersion
 from .serializers import (
@@ -69,7 +70,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
     search_fields = ["name", "description"]
     ordering_fields = ["name", "created_at", "updated_at", "status"]
     ordering = ["-created_at"]
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    parser_classes = [MultiPartParser, FormParser, ORJSONParser]
     
     # --- MODIFIED CREATE METHOD ---
     def create(self, request, *args, **kwargs):
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notification", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="notification_type",
+            field=models.CharField(
+                choices=[
+                    ("task_created", "Task Created"),
+                    ("task_assigned", "Task Assigned"),
+                    ("task_status_updated", "Task Status Updated"),
+                    ("task_completed", "Task Completed"),
+                    ("task_comment", "Task Comment"),
+                    ("project_created", "Project Created"),
+                    ("project_assigned", "Project Assigned"),
+                    ("project_member_added", "Project Member Added"),
+                    ("project_updated", "Project Updated"),
+                    ("chat_message", "Chat Message"),
+                    ("mention", "Mention"),
+                    ("reminder", "Reminder"),
+                    ("system", "System Notification"),
+                ],
+                default="system",
+                max_length=50,
+            ),
+        ),
+    ]
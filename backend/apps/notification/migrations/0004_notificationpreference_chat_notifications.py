@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notification", "0003_notification_chat_message_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationpreference",
+            name="chat_notifications",
+            field=models.BooleanField(default=True),
+        ),
+    ]
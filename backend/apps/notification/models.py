@@ -28,6 +28,9 @@ class Notification(models.Model):
         PROJECT_MEMBER_ADDED = 'project_member_added', 'Project Member Added'
         PROJECT_UPDATED = 'project_updated', 'Project Updated'
         
+        # Chat related
+        CHAT_MESSAGE = 'chat_message', 'Chat Message'
+        
         # General
         MENTION = 'mention', 'Mention'
         REMINDER = 'reminder', 'Reminder'
@@ -143,6 +146,7 @@ class NotificationPreference(models.Model):
     project_notifications = models.BooleanField(default=True)
     mention_notifications = models.BooleanField(default=True)
     system_notifications = models.BooleanField(default=True)
+    chat_notifications = models.BooleanField(default=True)
     
     # Future: Email notification preferences
     email_task_notifications = models.BooleanField(default=False)
@@ -167,6 +167,7 @@ class NotificationPreferenceSerializer(serializers.ModelSerializer):
             'project_notifications',
             'mention_notifications',
             'system_notifications',
+            'chat_notifications',
             'email_task_notifications',
             'email_project_notifications',
             'updated_at',
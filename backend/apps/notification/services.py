@@ -18,32 +18,48 @@ def get_or_create_preferences(user: User) -> NotificationPreference:
     return preferences
 
 
+# Map notification types to preference fields
+NOTIFICATION_TYPE_PREFERENCES = {
+    'task_created': 'task_notifications',
+    'task_assigned': 'task_notifications',
+    'task_status_updated': 'task_notifications',
+    'task_completed': 'task_notifications',
+    'task_comment': 'task_notifications',
+    'project_created': 'project_notifications',
+    'project_assigned': 'project_notifications',
+    'project_member_added': 'project_notifications',
+    'project_updated': 'project_notifications',
+    'mention': 'mention_notifications',
+    'chat_message': 'chat_notifications',
+    'system': 'system_notifications',
+    'reminder': 'system_notifications',
+}
+
+
 def should_notify(user: User, notification_type: str) -> bool:
     """
     Check if user should receive a notification based on their preferences.
     """
     preferences = get_or_create_preferences(user)
     
-    # Map notification types to preference fields
-    type_to_preference = {
-        'task_created': 'task_notifications',
-        'task_assigned': 'task_notifications',
-        'task_status_updated': 'task_notifications',
-        'task_completed': 'task_notifications',
-        'task_comment': 'task_notifications',
-        'project_created': 'project_notifications',
-        'project_assigned': 'project_notifications',
-        'project_member_added': 'project_notifications',
-        'project_updated': 'project_notifications',
-        'mention': 'mention_notifications',
-        'system': 'system_notifications',
-        'reminder': 'system_notifications',
-    }
-    
-    preference_field = type_to_preference.get(notification_type, 'system_notifications')
+    preference_field = NOTIFICATION_TYPE_PREFERENCES.get(notification_type, 'system_notifications')
     return getattr(preferences, preference_field, True)
 
 
+def opted_out_user_ids(notification_type: str):
+    """
+    IDs of users who turned off a notification type, as a lazy queryset.
+    
+    The bulk counterpart of should_notify: exclude these from a recipient
+    query (user_id__in=...) to filter by preference in the same SELECT.
+    Users without a preferences row get the defaults, which are all on.
+    """
+    preference_field = NOTIFICATION_TYPE_PREFERENCES.get(notification_type, 'system_notifications')
+    return NotificationPreference.objects.filter(
+        **{preference_field: False}
+    ).values('user_id')
+
+
 def create_notification(
     recipient: User,
     title: str,
@@ -184,13 +200,19 @@ def notify(
 
 
 def bulk_create_notifications(
-    notifications_data: List[Dict[str, Any]]
+    notifications_data: List[Dict[str, Any]],
+    batch_size: Optional[int] = None
 ) -> List[Notification]:
     """
     Create multiple notifications efficiently using bulk_create.
+    Preferences are not checked; callers filter recipients themselves
+    (see opted_out_user_ids).
     
     Args:
-        notifications_data: List of dictionaries with notification data
+        notifications_data: List of dictionaries with notification data.
+            Each names its recipient as a User ('recipient') or by ID
+            ('recipient_id'), so callers don't need to load User rows.
+        batch_size: Rows per INSERT statement (default: all in one)
     
     Returns:
         List of created Notification instances
@@ -201,7 +223,6 @@ def bulk_create_notifications(
         related_object = data.pop('related_object', None)
         
         notification = Notification(
-            recipient=data['recipient'],
             title=data['title'],
             message=data['message'],
             notification_type=data.get('notification_type', Notification.NotificationType.SYSTEM),
@@ -210,13 +231,18 @@ def bulk_create_notifications(
             metadata=data.get('metadata', {}),
         )
         
+        if 'recipient' in data:
+            notification.recipient = data['recipient']
+        else:
+            notification.recipient_id = data['recipient_id']
+        
         if related_object:
             notification.content_type = ContentType.objects.get_for_model(related_object)
             notification.object_id = str(related_object.pk)
         
         notifications.append(notification)
     
-    return Notification.objects.bulk_create(notifications)
+    return Notification.objects.bulk_create(notifications, batch_size=batch_size)
 
 
 # ============================================================================
@@ -2,6 +2,7 @@
 Serializers for Projects app.
 """
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 
 from apps.users.serializers import UserMinimalSerializer
@@ -128,6 +129,7 @@ class ProjectCreateSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "members"]
 
+    @transaction.atomic
     def create(self, validated_data):
         assigned_members_data = validated_data.pop("assigned_members", [])
         project = Project.objects.create(**validated_data)
@@ -365,7 +365,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         try:
             membership = ProjectMembership.objects.get(project=project, user_id=user_id)
             membership.role = new_role
-            membership.save()
+            membership.save(update_fields=["role"])
             return Response(ProjectMembershipSerializer(membership).data)
         except ProjectMembership.DoesNotExist:
             return Response({"detail": "User is not a member"}, status=status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:07
+
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Concat, Trim
+
+
+def backfill_full_name(apps, schema_editor):
+    User = apps.get_model("users", "User")
+    User.objects.update(full_name=Trim(Concat("first_name", Value(" "), "last_name")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="full_name",
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.RunPython(backfill_full_name, migrations.RunPython.noop),
+    ]
@@ -24,6 +24,9 @@ class User(AbstractUser):
     # NEW: Store skills as a list of strings
     skills = models.JSONField(default=list, blank=True)
     
+    # Denormalized get_full_name(), kept in sync on save
+    full_name = models.CharField(max_length=300, blank=True, editable=False)
+    
     class Meta:
         db_table = "users"
         ordering = ["username"]
@@ -44,6 +47,12 @@ class User(AbstractUser):
             # Be careful if you want Managers to have Django Admin panel access
             if not self.is_superuser: 
                 self.is_staff = False
+        
+        # 3. Keep the stored full name in sync with first/last name
+        self.full_name = self.get_full_name()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'first_name', 'last_name'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'full_name'}
                 
         super().save(*args, **kwargs)
     
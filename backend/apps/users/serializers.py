@@ -82,14 +82,15 @@ class UserMinimalSerializer(serializers.ModelSerializer):
     """
     Minimal serializer for user references.
     """
-    full_name = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ["id", "username", "full_name", "avatar"]
     
-    def get_full_name(self, obj):
-        return obj.get_full_name() or obj.username
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["full_name"] = data["full_name"] or instance.username
+        return data
     
 class ForgotPasswordSerializer(serializers.Serializer):
     email = serializers.EmailField()
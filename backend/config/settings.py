@@ -93,12 +93,26 @@ REDIS_URL = config("REDIS_URL", default="redis://redis:6379/0")
 
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "BACKEND": "core.channel_layers.GroupKeyCachingRedisChannelLayer",
         "CONFIG": {
             "hosts": [REDIS_URL],
         },
     },
 }
+
+# Shared cache for every worker process. Chat access grants, room rows and
+# room-list freshness stamps are invalidated by deleting keys here, which
+# only works if all processes read the same store. Kept on its own Redis
+# database, apart from the channel layer.
+REDIS_CACHE_URL = config("REDIS_CACHE_URL", default="redis://redis:6379/1")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_CACHE_URL,
+    },
+}
+
 # Database
 # Default to SQLite for easy development, use DATABASE_URL for PostgreSQL
 DATABASE_URL = config(
@@ -115,9 +129,20 @@ if DATABASE_URL.startswith("sqlite"):
         }
     }
 else:
+    # Keep connections open across requests and WebSocket handshakes instead
+    # of reconnecting every time; health checks drop connections that died
+    # while idle
     DATABASES = {
-        "default": dj_database_url.parse(DATABASE_URL)
+        "default": dj_database_url.parse(
+            DATABASE_URL,
+            conn_max_age=config("DB_CONN_MAX_AGE", default=600, cast=int),
+            conn_health_checks=True,
+        )
     }
+    # Required when running behind pgbouncer in transaction pooling mode
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = config(
+        "DB_DISABLE_SERVER_SIDE_CURSORS", default=False, cast=bool
+    )
 
 # Custom User Model
 AUTH_USER_MODEL = "users.User"
@@ -160,6 +185,10 @@ CORS_ALLOWED_ORIGINS = config(
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = config("CORS_ALLOW_ALL", default=True, cast=bool)  # For development
 STATIC_API_TOKEN = config("STATIC_API_TOKEN", default=None)
+
+# Chat read receipts are derived from ChatRoomMembership.last_read_at; enable to
+# also write legacy per-message MessageReadStatus rows
+CHAT_MESSAGE_READ_ROWS = config("CHAT_MESSAGE_READ_ROWS", default=False, cast=bool)
 # Django REST Framework
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
@@ -169,6 +198,15 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.SearchFilter",
@@ -0,0 +1,18 @@
+"""
+Django settings for running the ZanFlow test suite.
+
+`manage.py test` picks this module up by default; other runners should
+point DJANGO_SETTINGS_MODULE at it.
+"""
+from .settings import *  # noqa: F401,F403
+
+# Test suites create dozens of throwaway users; the default PBKDF2 work
+# factor would dominate their runtime
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+# Tests must not need a Redis server; each test process gets its own cache
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
@@ -0,0 +1,32 @@
+"""
+Core channel layers for ZanFlow.
+"""
+from channels_redis.core import RedisChannelLayer
+
+
+class GroupKeyCachingRedisChannelLayer(RedisChannelLayer):
+    """
+    RedisChannelLayer that validates and encodes each group name once.
+
+    The stock layer regex-checks the group name and builds its UTF-8 Redis
+    key on every group_send/group_add/group_discard. Chat broadcasts reuse
+    the same small set of room groups, so both results are memoized.
+    """
+    GROUP_CACHE_MAX_SIZE = 10000
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._group_keys = {}
+
+    def valid_group_name(self, name):
+        if name in self._group_keys:
+            return True
+        return super().valid_group_name(name)
+
+    def _group_key(self, group):
+        key = self._group_keys.get(group)
+        if key is None:
+            if len(self._group_keys) >= self.GROUP_CACHE_MAX_SIZE:
+                self._group_keys.clear()
+            key = self._group_keys[group] = super()._group_key(group)
+        return key
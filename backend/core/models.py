@@ -1,10 +1,32 @@
 """
 Core base models for ZanFlow.
 """
+import os
+import time
+import uuid
+
 from django.conf import settings
 from django.db import models
 
 
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (RFC 9562 version 7).
+
+    The leading 48 bits are the Unix time in milliseconds, so keys generated
+    later sort later and inserts append to the right edge of btree indexes
+    instead of landing on random pages like uuid4.
+    """
+    unix_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), 'big')
+    value = (unix_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76  # version
+    value |= ((rand >> 62) & 0xFFF) << 64
+    value |= 0b10 << 62  # RFC 4122 variant
+    value |= rand & 0x3FFF_FFFF_FFFF_FFFF
+    return uuid.UUID(int=value)
+
+
 class TimeStampedModel(models.Model):
     """
     Abstract base model with created_at and updated_at timestamps.
@@ -0,0 +1,21 @@
+"""
+Core DRF parsers for ZanFlow.
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser backed by orjson.
+
+    Like the stock parser (strict mode) it rejects NaN and Infinity, and it
+    reports malformed bodies as a ParseError.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,24 @@
+"""
+Core DRF renderers for ZanFlow.
+"""
+import orjson
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson.
+
+    orjson natively handles dicts, lists, UUIDs and datetimes; anything else
+    (Decimal, lazy translation strings, querysets, ...) falls back to DRF's
+    JSONEncoder so output matches the stock renderer.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+    _default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return orjson.dumps(data, default=self._default, option=self.options)